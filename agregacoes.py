@@ -0,0 +1,106 @@
+import threading
+from collections import Counter
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from esquema import COLUNAS_CATEGORICAS, OPCOES, codigos
+
+
+class Agregacoes:
+    """Contagens e tabelas de contingência de todos os pares de perguntas.
+
+    As tabelas são somadas bloco a bloco à medida que respostas chegam, e os
+    DataFrames entregues ao painel ficam memorizados até a próxima versão.
+    """
+
+    def __init__(self, colunas=COLUNAS_CATEGORICAS):
+        self.colunas = list(colunas)
+        self.versao = 0
+        self._indice = {col: j for j, col in enumerate(self.colunas)}
+        self._contagens = {col: np.zeros(len(OPCOES[col]), dtype=np.int64) for col in self.colunas}
+        self._pares = {
+            (a, b): np.zeros((len(OPCOES[a]), len(OPCOES[b])), dtype=np.int64)
+            for a, b in combinations(self.colunas, 2)
+        }
+        self._metodos = Counter()
+        self._memo = {}
+        self._trava = threading.Lock()
+
+    def adicionar(self, bloco):
+        matriz = codigos(bloco, self.colunas).astype(np.int64)
+        with self._trava:
+            for col, j in self._indice.items():
+                coluna = matriz[:, j]
+                self._contagens[col] += np.bincount(
+                    coluna[coluna >= 0], minlength=len(OPCOES[col])
+                )
+            for (a, b), tabela in self._pares.items():
+                ca, cb = matriz[:, self._indice[a]], matriz[:, self._indice[b]]
+                validos = (ca >= 0) & (cb >= 0)
+                kb = tabela.shape[1]
+                tabela += np.bincount(
+                    ca[validos] * kb + cb[validos], minlength=tabela.size
+                ).reshape(tabela.shape)
+            if "Metodos_prevencao" in bloco.columns:
+                self._metodos.update(bloco["Metodos_prevencao"].dropna())
+            self.versao += len(bloco)
+            self._memo.clear()
+
+    def _memorizado(self, chave, calcular):
+        with self._trava:
+            if chave not in self._memo:
+                self._memo[chave] = calcular()
+            return self._memo[chave]
+
+    def contagem(self, coluna):
+        # Equivalente a value_counts(sort=False), na ordem do formulário
+        def calcular():
+            if coluna == "Metodos_prevencao":
+                return pd.Series(self._metodos, name=coluna, dtype=np.int64)
+            return pd.Series(self._contagens[coluna].copy(), index=OPCOES[coluna], name=coluna)
+        return self._memorizado(("contagem", coluna), calcular)
+
+    def tabela(self, linha, coluna):
+        # Equivalente a pd.crosstab(dados[linha], dados[coluna])
+        def calcular():
+            if (linha, coluna) in self._pares:
+                valores = self._pares[(linha, coluna)].copy()
+            else:
+                valores = self._pares[(coluna, linha)].T.copy()
+            return pd.DataFrame(
+                valores,
+                index=pd.Index(OPCOES[linha], name=linha),
+                columns=pd.Index(OPCOES[coluna], name=coluna),
+            )
+        return self._memorizado(("tabela", linha, coluna), calcular)
+
+    def associacoes(self):
+        # Qui-quadrado e V de Cramér de todos os pares, uma vez por versão
+        from associacoes import testar_pares
+        return self._memorizado(("associacoes",), lambda: testar_pares(self._pares))
+
+    def descricao(self):
+        def calcular():
+            contagens = {
+                col: pd.Series(contagem, index=OPCOES[col])
+                for col, contagem in self._contagens.items()
+            }
+            contagens["Metodos_prevencao"] = pd.Series(self._metodos, dtype=np.int64)
+            return descrever(contagens)
+        return self._memorizado(("descricao",), calcular)
+
+
+def descrever(contagens):
+    # Mesmas linhas de describe() para colunas de texto: count, unique, top, freq
+    resumo = {}
+    for col, serie in contagens.items():
+        serie = serie[serie > 0]
+        resumo[col] = {
+            "count": int(serie.sum()),
+            "unique": len(serie),
+            "top": serie.idxmax() if len(serie) else None,
+            "freq": int(serie.max()) if len(serie) else None,
+        }
+    return pd.DataFrame(resumo)
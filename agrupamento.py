@@ -0,0 +1,440 @@
+import copy
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from joblib import Parallel, delayed
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.decomposition import PCA, IncrementalPCA
+from sklearn.metrics import silhouette_score
+from sklearn.preprocessing import StandardScaler
+
+from caracteristicas import CodificadorRespostas
+from esquema import COLUNAS_CATEGORICAS, OPCOES, chave_filtros, codigos
+
+# A partir deste número de respostas usa-se MiniBatchKMeans com partial_fit
+LIMITE_MINIBATCH = 50000
+# Até este número de respostas o primeiro ajuste é feito na própria página
+# (exceto com n_clusters="auto", cuja avaliação sempre roda em segundo plano)
+LIMITE_SINCRONO = 5000
+# Número de grupos usado quando a silhueta não distingue nenhum k
+K_PADRAO = 3
+# O PCA é ajustado sobre uma amostra densa de no máximo este tamanho
+AMOSTRA_PCA = 20000
+# Linhas convertidas para formato denso de cada vez ao projetar no PCA
+BLOCO_PCA = 10000
+# Silhueta calculada sobre uma amostra deste tamanho (o cálculo é quadrático)
+AMOSTRA_SILHUETA = 5000
+# Perguntas cuja média ordinal define a ordem dos grupos
+COLUNAS_CONHECIMENTO = ("Conhecimento_PrEP", "Conhecimento_PEP")
+# Pontos guardados para o gráfico de dispersão no agrupamento em blocos
+AMOSTRA_GRAFICO = 20000
+# Perfis dos grupos guardados por versão do modelo, versão dos dados e filtro
+MAX_PERFIS = 32
+
+
+class ModeloAgrupamento:
+    """Escalonador, K-Means e PCA ajustados juntos sobre uma versão dos dados.
+
+    Os rótulos do K-Means são arbitrários; `mapa` os renumera para que o
+    grupo 0 tenha o menor conhecimento médio de PrEP/PEP e o último, o maior.
+    `conhecimento` guarda essa média (0 a 1) na nova numeração.
+    """
+
+    def __init__(self, scaler, kmeans, pca, versao, mapa, conhecimento, avaliacao=None):
+        self.scaler = scaler
+        self.kmeans = kmeans
+        self.pca = pca
+        self.versao = versao
+        self.mapa = mapa
+        self.conhecimento = conhecimento
+        self.avaliacao = avaliacao
+
+    @property
+    def n_clusters(self):
+        return self.kmeans.n_clusters
+
+    def aplicar(self, matriz):
+        dados_scaled = self.scaler.transform(matriz)
+        return self.mapa[self.kmeans.predict(dados_scaled)], projetar(self.pca, dados_scaled)
+
+
+def projetar(pca, matriz):
+    # O PCA não aceita matriz esparsa: projeta em blocos densos de tamanho fixo
+    if matriz.shape[0] == 0:
+        return np.empty((0, pca.n_components_))
+    return np.vstack([
+        pca.transform(matriz[inicio:inicio + BLOCO_PCA].toarray())
+        for inicio in range(0, matriz.shape[0], BLOCO_PCA)
+    ])
+
+
+def somar_conhecimento(matriz, clusters, n_clusters, codificador):
+    # Tamanho de cada grupo e soma da escala ordinal de conhecimento (sem padronização)
+    indices = [codificador.nomes.index(col) for col in COLUNAS_CONHECIMENTO]
+    conhecimento = np.asarray(matriz[:, indices].mean(axis=1)).ravel()
+    tamanhos = np.bincount(clusters, minlength=n_clusters)
+    return tamanhos, np.bincount(clusters, weights=conhecimento, minlength=n_clusters)
+
+
+def ordenar_grupos(tamanhos, somas):
+    # mapa[rótulo do K-Means] = posição do grupo, do menor para o maior conhecimento médio
+    medias = somas / np.maximum(tamanhos, 1)
+    ordem = np.argsort(medias, kind="stable")
+    mapa = np.empty(len(medias), dtype=np.int64)
+    mapa[ordem] = np.arange(len(medias))
+    return mapa, medias[ordem]
+
+
+def ordenar_por_conhecimento(matriz, clusters, n_clusters, codificador):
+    return ordenar_grupos(*somar_conhecimento(matriz, clusters, n_clusters, codificador))
+
+
+def distribuicoes_por_grupo(clusters, matriz_codigos, colunas, n_clusters):
+    # Uma tabela (grupo x opção) por pergunta, cada uma contada com um bincount
+    # sobre grupo * opções + código. Uma coluna por vez e em int32: os
+    # temporários têm o tamanho de uma coluna, não da matriz inteira
+    clusters = np.asarray(clusters, dtype=np.int32)
+    distribuicoes = {}
+    for j, col in enumerate(colunas):
+        opcoes = len(OPCOES[col])
+        coluna = matriz_codigos[:, j]
+        validos = coluna >= 0
+        posicoes = clusters[validos] * opcoes + coluna[validos]
+        distribuicoes[col] = np.bincount(posicoes, minlength=n_clusters * opcoes).reshape(n_clusters, opcoes)
+    return distribuicoes
+
+
+def descrever_grupos(conhecimento):
+    # Texto de cada grupo, já numerado do menor para o maior conhecimento
+    descricoes = []
+    for posicao, media in enumerate(conhecimento):
+        if posicao == 0:
+            nivel = "menor conhecimento sobre PrEP/PEP"
+        elif posicao == len(conhecimento) - 1:
+            nivel = "maior conhecimento sobre PrEP/PEP"
+        else:
+            nivel = "conhecimento intermediário sobre PrEP/PEP"
+        descricoes.append(f"{nivel} (índice médio de conhecimento: {media:.0%})")
+    return descricoes
+
+
+def _avaliar(matriz, k, semente, minibatch):
+    if minibatch:
+        kmeans = MiniBatchKMeans(n_clusters=k, random_state=semente, batch_size=4096, n_init=1)
+    else:
+        kmeans = KMeans(n_clusters=k, random_state=semente, n_init=1)
+    rotulos = kmeans.fit_predict(matriz)
+    silhueta = np.nan
+    if len(np.unique(rotulos)) > 1:
+        silhueta = silhouette_score(
+            matriz, rotulos, sample_size=min(AMOSTRA_SILHUETA, matriz.shape[0]), random_state=semente
+        )
+    return {"k": k, "semente": semente, "inercia": kmeans.inertia_, "silhueta": silhueta}
+
+
+def avaliar_k(matriz, ks=range(2, 9), sementes=(0, 1, 2), n_jobs=-1, minibatch=False):
+    # Cada combinação (k, semente) roda em um processo separado
+    ks = [k for k in ks if k < matriz.shape[0]]
+    resultados = Parallel(n_jobs=n_jobs)(
+        delayed(_avaliar)(matriz, k, semente, minibatch) for k in ks for semente in sementes
+    )
+    return pd.DataFrame(resultados)
+
+
+def escolher_k(avaliacao):
+    # Maior silhueta média entre as sementes. Se nenhuma for definida (ex.:
+    # respostas todas iguais, com um único grupo de fato), usa K_PADRAO, ou o
+    # maior k avaliado quando há poucas respostas para ele
+    silhuetas = avaliacao.groupby("k")["silhueta"].mean()
+    if silhuetas.notna().any():
+        return int(silhuetas.idxmax())
+    return int(min(K_PADRAO, silhuetas.index.max()))
+
+
+class PerfisGrupos:
+    """Tamanho de cada grupo e distribuição de cada pergunta dentro dele."""
+
+    def __init__(self, tamanhos, distribuicoes):
+        self.tamanhos = tamanhos
+        self.distribuicoes = distribuicoes
+
+    def distribuicao(self, cluster, coluna):
+        # Equivalente a value_counts() da pergunta dentro do grupo, na ordem do formulário
+        return pd.Series(self.distribuicoes[coluna][cluster], index=OPCOES[coluna], name=coluna)
+
+
+def perfis_por_grupo(clusters, matriz_codigos, colunas, n_clusters):
+    # `matriz_codigos` vem de esquema.codigos: nenhum DataFrame é copiado ou filtrado
+    return PerfisGrupos(
+        np.bincount(clusters, minlength=n_clusters),
+        distribuicoes_por_grupo(clusters, matriz_codigos, colunas, n_clusters),
+    )
+
+
+class ResultadoAgrupamento:
+    """Agrupamento pronto para exibição, sem o modelo que o gerou.
+
+    Guarda só o que o painel mostra: pontos (grupo e coordenadas PCA) e os
+    perfis dos grupos (PerfisGrupos). No agrupamento em blocos os pontos são
+    uma amostra uniforme, então a memória não depende do número de respostas.
+    Os grupos seguem a mesma numeração por conhecimento do ModeloAgrupamento.
+    """
+
+    avaliacao = None
+
+    def __init__(self, versao, clusters, componentes, conhecimento, perfis):
+        self.versao = versao
+        self.clusters = clusters
+        self.componentes = componentes
+        self.conhecimento = conhecimento
+        self.perfis = perfis
+
+    @property
+    def n_clusters(self):
+        return len(self.perfis.tamanhos)
+
+
+def agrupar_em_blocos(blocos, versao, n_clusters=3, amostra=AMOSTRA_GRAFICO, semente=42):
+    """MiniBatchKMeans e IncrementalPCA ajustados bloco a bloco.
+
+    `blocos()` deve devolver, a cada chamada, um novo iterador de DataFrames
+    categorizados. São três passagens: escala, ajuste e atribuição dos grupos.
+    """
+    codificador = CodificadorRespostas()
+    n_clusters = min(n_clusters, versao - 1)
+    scaler = StandardScaler(with_mean=False)
+    for bloco in blocos():
+        scaler.partial_fit(codificador.transformar(bloco))
+
+    kmeans = MiniBatchKMeans(n_clusters=n_clusters, random_state=semente, batch_size=4096, n_init=3)
+    pca = IncrementalPCA(n_components=2)
+    for bloco in blocos():
+        matriz = scaler.transform(codificador.transformar(bloco))
+        # Blocos menores que o número de grupos (ou de componentes) só são
+        # aceitos depois que o modelo já foi inicializado
+        if matriz.shape[0] >= n_clusters or hasattr(kmeans, "cluster_centers_"):
+            kmeans.partial_fit(matriz)
+        if matriz.shape[0] >= pca.n_components:
+            pca.partial_fit(matriz.toarray())
+
+    rng = np.random.default_rng(semente)
+    chaves = np.empty(0)
+    grupos = np.empty(0, dtype=np.int64)
+    pontos = np.empty((0, 2))
+    tamanhos = np.zeros(n_clusters, dtype=np.int64)
+    somas = np.zeros(n_clusters)
+    distribuicoes = None
+    for bloco in blocos():
+        bruta = codificador.transformar(bloco)
+        matriz = scaler.transform(bruta)
+        rotulos = kmeans.predict(matriz)
+        tamanhos_bloco, somas_bloco = somar_conhecimento(bruta, rotulos, n_clusters, codificador)
+        tamanhos += tamanhos_bloco
+        somas += somas_bloco
+        do_bloco = distribuicoes_por_grupo(
+            rotulos, codigos(bloco, codificador.colunas), codificador.colunas, n_clusters
+        )
+        if distribuicoes is None:
+            distribuicoes = do_bloco
+        else:
+            for col, tabela in do_bloco.items():
+                distribuicoes[col] += tabela
+        # Amostra uniforme: ficam as `amostra` linhas com as menores chaves
+        # aleatórias; só as candidatas a entrar são projetadas no PCA
+        novas = rng.random(len(rotulos))
+        limiar = np.partition(chaves, amostra - 1)[amostra - 1] if len(chaves) >= amostra else 1.0
+        candidatas = np.flatnonzero(novas < limiar)
+        chaves = np.concatenate([chaves, novas[candidatas]])
+        grupos = np.concatenate([grupos, rotulos[candidatas]])
+        pontos = np.vstack([pontos, projetar(pca, matriz[candidatas])])
+        if len(chaves) > amostra:
+            manter = np.argpartition(chaves, amostra - 1)[:amostra]
+            chaves, grupos, pontos = chaves[manter], grupos[manter], pontos[manter]
+
+    mapa, conhecimento = ordenar_grupos(tamanhos, somas)
+    ordem = np.argsort(mapa)
+    return ResultadoAgrupamento(
+        versao,
+        mapa[grupos],
+        pontos,
+        conhecimento,
+        PerfisGrupos(tamanhos[ordem], {col: tabela[ordem] for col, tabela in distribuicoes.items()}),
+    )
+
+
+class PipelineAgrupamento:
+    """Agrupamento compartilhado entre sessões e ligado à versão dos dados.
+
+    A versão é o número de respostas. O modelo só é reajustado quando chegam
+    respostas novas suficientes, e esse reajuste roda em uma thread separada;
+    enquanto isso as respostas novas recebem o cluster previsto pelo modelo
+    atual. Cada resposta é codificada uma única vez pelo CodificadorRespostas.
+
+    Com n_clusters="auto", cada ajuste avalia os valores de `ks` com várias
+    sementes em paralelo e usa o k de maior silhueta média.
+    """
+
+    def __init__(self, n_clusters=3, min_novas=20, fracao_novas=0.1, minibatch=None,
+                 limite_minibatch=LIMITE_MINIBATCH, limite_sincrono=LIMITE_SINCRONO,
+                 ks=range(2, 9), sementes=(0, 1, 2), n_jobs=-1):
+        self.n_clusters = n_clusters
+        self.ks = ks
+        self.sementes = sementes
+        self.n_jobs = n_jobs
+        self.min_novas = min_novas
+        self.fracao_novas = fracao_novas
+        self.minibatch = minibatch
+        self.limite_minibatch = limite_minibatch
+        self.limite_sincrono = limite_sincrono
+        self.codificador = CodificadorRespostas()
+        self.modelo = None
+        self._clusters = None
+        self._componentes = None
+        self._blocos = []
+        self._codificadas = 0
+        self._em_ajuste = False
+        self._perfis = OrderedDict()
+        self._trava = threading.Lock()
+
+    def _usar_minibatch(self, total):
+        if self.minibatch is not None:
+            return self.minibatch
+        return total >= self.limite_minibatch
+
+    def _precisa_reajustar(self, versao):
+        novas = versao - self.modelo.versao
+        return novas >= max(self.min_novas, int(self.fracao_novas * self.modelo.versao))
+
+    def matriz(self, dados, inicio=0):
+        # Linhas [inicio, len(dados)) codificadas; só as respostas novas passam
+        # pelo codificador, as anteriores vêm dos blocos já guardados
+        with self._trava:
+            codificadas = self._codificadas
+            if len(dados) > codificadas:
+                self._blocos.append(self.codificador.transformar(dados.iloc[codificadas:]))
+                self._codificadas = len(dados)
+            if inicio >= codificadas:
+                return self._blocos[-1][inicio - codificadas:len(dados) - codificadas]
+            if len(self._blocos) > 1:
+                self._blocos = [sp.vstack(self._blocos, format="csr")]
+            return self._blocos[0][inicio:len(dados)]
+
+    def ajustar(self, dados):
+        # Ajuste completo; o modelo anterior continua em uso até a troca
+        matriz = self.matriz(dados)
+        scaler = StandardScaler(with_mean=False)
+        dados_scaled = scaler.fit_transform(matriz)
+        minibatch = self._usar_minibatch(matriz.shape[0])
+        avaliacao = None
+        if self.n_clusters == "auto":
+            avaliacao = avaliar_k(dados_scaled, self.ks, self.sementes, self.n_jobs, minibatch)
+            n_clusters = escolher_k(avaliacao)
+        else:
+            n_clusters = min(self.n_clusters, matriz.shape[0] - 1)
+        if minibatch:
+            kmeans = MiniBatchKMeans(n_clusters=n_clusters, random_state=42, batch_size=4096)
+        else:
+            kmeans = KMeans(n_clusters=n_clusters, random_state=42)
+        clusters = kmeans.fit_predict(dados_scaled)
+        mapa, conhecimento = ordenar_por_conhecimento(matriz, clusters, n_clusters, self.codificador)
+        amostra = np.random.default_rng(42).permutation(matriz.shape[0])[:AMOSTRA_PCA]
+        pca = PCA(n_components=2)
+        pca.fit(dados_scaled[np.sort(amostra)].toarray())
+        componentes = projetar(pca, dados_scaled)
+        modelo = ModeloAgrupamento(scaler, kmeans, pca, matriz.shape[0], mapa, conhecimento, avaliacao)
+        self._trocar_modelo(modelo, mapa[clusters], componentes)
+
+    def ajustar_parcial(self, dados):
+        # Modo MiniBatch: incorpora só as respostas novas aos centróides atuais
+        with self._trava:
+            modelo = self.modelo
+        novas = self.matriz(dados, modelo.versao)
+        kmeans = copy.deepcopy(modelo.kmeans)
+        kmeans.partial_fit(modelo.scaler.transform(novas))
+        matriz = self.matriz(dados)
+        dados_scaled = modelo.scaler.transform(matriz)
+        clusters = kmeans.predict(dados_scaled)
+        mapa, conhecimento = ordenar_por_conhecimento(matriz, clusters, modelo.n_clusters, self.codificador)
+        novo = ModeloAgrupamento(
+            modelo.scaler, kmeans, modelo.pca, len(dados), mapa, conhecimento, modelo.avaliacao
+        )
+        self._trocar_modelo(novo, mapa[clusters], projetar(modelo.pca, dados_scaled))
+
+    def _trocar_modelo(self, modelo, clusters, componentes):
+        with self._trava:
+            if self.modelo is None or modelo.versao >= self.modelo.versao:
+                self.modelo = modelo
+                self._clusters = clusters
+                self._componentes = componentes
+
+    def _em_segundo_plano(self, funcao, dados):
+        with self._trava:
+            if self._em_ajuste:
+                return
+            self._em_ajuste = True
+
+        def tarefa():
+            try:
+                funcao(dados)
+            finally:
+                with self._trava:
+                    self._em_ajuste = False
+
+        threading.Thread(target=tarefa, daemon=True).start()
+
+    def resultado(self, dados, esperar=False):
+        # Retorna (clusters, componentes PCA, modelo) para todas as linhas de
+        # `dados`, ou None se o primeiro ajuste ainda estiver em andamento.
+        # Com esperar=True os ajustes são feitos na hora, nunca em segundo plano;
+        # no modo automático, a avaliação dos vários k nunca roda na página
+        versao = len(dados)
+        if self.modelo is None:
+            if (versao > self.limite_sincrono or self.n_clusters == "auto") and not esperar:
+                self._em_segundo_plano(self.ajustar, dados)
+                return None
+            self.ajustar(dados)
+        elif self._precisa_reajustar(versao):
+            # partial_fit só existe no MiniBatchKMeans: um modelo ajustado abaixo de
+            # limite_minibatch passa por um ajuste completo, que já troca de algoritmo
+            parcial = self._usar_minibatch(versao) and isinstance(self.modelo.kmeans, MiniBatchKMeans)
+            funcao = self.ajustar_parcial if parcial else self.ajustar
+            if esperar:
+                funcao(dados)
+            else:
+                self._em_segundo_plano(funcao, dados)
+        return self._estender(dados)
+
+    def perfis(self, dados, clusters, modelo, linhas=None, filtros=None):
+        # PerfisGrupos de `clusters` (vindos de resultado, já restritos às
+        # `linhas` filtradas), guardados por versão do modelo, versão dos
+        # dados e combinação de filtros: as recargas da página não recontam nada
+        chave = (modelo.versao, modelo.n_clusters, len(dados), chave_filtros(filtros))
+        with self._trava:
+            if chave in self._perfis:
+                self._perfis.move_to_end(chave)
+                return self._perfis[chave]
+        matriz_codigos = codigos(dados, COLUNAS_CATEGORICAS)
+        if linhas is not None:
+            matriz_codigos = matriz_codigos[linhas]
+        perfis = perfis_por_grupo(clusters, matriz_codigos, COLUNAS_CATEGORICAS, modelo.n_clusters)
+        with self._trava:
+            self._perfis[chave] = perfis
+            while len(self._perfis) > MAX_PERFIS:
+                self._perfis.popitem(last=False)
+        return perfis
+
+    def _estender(self, dados):
+        # Prevê apenas as linhas que chegaram depois do último ajuste
+        with self._trava:
+            modelo, clusters, componentes = self.modelo, self._clusters, self._componentes
+        if len(dados) > len(clusters):
+            novos_clusters, novos_componentes = modelo.aplicar(self.matriz(dados, len(clusters)))
+            clusters = np.concatenate([clusters, novos_clusters])
+            componentes = np.vstack([componentes, novos_componentes])
+            with self._trava:
+                if self.modelo is modelo:
+                    self._clusters, self._componentes = clusters, componentes
+        return clusters[:len(dados)], componentes[:len(dados)], modelo
@@ -0,0 +1,82 @@
+import logging
+import threading
+
+from agregacoes import Agregacoes
+from esquema import categorizar
+from tendencias import SeriesTemporais
+
+# Respostas lidas do armazenamento de cada vez
+TAMANHO_BLOCO = 50000
+
+logger = logging.getLogger(__name__)
+
+
+class AnaliseEmBlocos:
+    """Painel de análise calculado sem manter as respostas em memória.
+
+    Contagens, tabelas cruzadas, descrição e séries temporais são somadas
+    bloco a bloco (ler_em_blocos), e cada atualização lê só as linhas novas.
+    O agrupamento percorre o armazenamento de novo, também em blocos, em uma
+    thread separada e só quando chegam respostas novas suficientes. A memória
+    usada depende do tamanho do bloco e da amostra do gráfico, não do total.
+    """
+
+    def __init__(self, armazenamento, tamanho_bloco=TAMANHO_BLOCO, n_clusters=3,
+                 min_novas=20, fracao_novas=0.1):
+        self.armazenamento = armazenamento
+        self.tamanho_bloco = tamanho_bloco
+        self.n_clusters = n_clusters
+        self.min_novas = min_novas
+        self.fracao_novas = fracao_novas
+        self.versao = 0
+        # Posição no armazenamento (id no SQLite, bytes no CSV), como em DadosCompartilhados
+        self.posicao = 0
+        self.agregacoes = Agregacoes()
+        self.series = SeriesTemporais()
+        self._agrupamento = None
+        self._em_ajuste = False
+        self._trava = threading.Lock()
+
+    def _blocos(self, limite=None):
+        for bloco in self.armazenamento.ler_em_blocos(self.tamanho_bloco, limite):
+            yield categorizar(bloco)
+
+    def atualizar(self):
+        # Soma às agregações apenas as linhas gravadas desde a última leitura,
+        # retomando da posição guardada (sem percorrer as linhas já lidas)
+        with self._trava:
+            if self.armazenamento.marcador() == self.posicao:
+                return self.versao
+            for bloco, posicao in self.armazenamento.ler_em_blocos_desde(self.posicao, self.tamanho_bloco):
+                bloco = categorizar(bloco)
+                self.agregacoes.adicionar(bloco)
+                self.series.adicionar(bloco)
+                self.versao += len(bloco)
+                self.posicao = posicao
+            return self.versao
+
+    def agrupamento(self):
+        # Último resultado (ResultadoAgrupamento), ou None antes do primeiro ajuste
+        with self._trava:
+            resultado, versao = self._agrupamento, self.versao
+            if versao < 3 or self._em_ajuste:
+                return resultado
+            if resultado is not None:
+                novas = versao - resultado.versao
+                if novas < max(self.min_novas, int(self.fracao_novas * resultado.versao)):
+                    return resultado
+            self._em_ajuste = True
+        threading.Thread(target=self._agrupar, args=(versao,), daemon=True).start()
+        return resultado
+
+    def _agrupar(self, versao):
+        from agrupamento import agrupar_em_blocos
+        try:
+            resultado = agrupar_em_blocos(lambda: self._blocos(limite=versao), versao, self.n_clusters)
+            with self._trava:
+                self._agrupamento = resultado
+        except Exception:
+            logger.exception("Falha no agrupamento em blocos")
+        finally:
+            with self._trava:
+                self._em_ajuste = False
@@ -0,0 +1,400 @@
+import atexit
+import csv
+import io
+import itertools
+import json
+import logging
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+from esquema import COLUNAS
+
+try:
+    import fcntl
+except ImportError:  # Windows: a trava fica restrita ao processo atual
+    fcntl = None
+
+CSV_LEGADO = "respostas_prep.csv"
+BANCO_PADRAO = "respostas_prep.db"
+# Tentativas de gravar um lote antes de desviá-lo para o arquivo de falhas,
+# com espera dobrando a cada tentativa até ESPERA_MAXIMA_TENTATIVA segundos
+TENTATIVAS_GRAVACAO = 5
+ESPERA_MAXIMA_TENTATIVA = 30.0
+
+_TRAVA_LOCAL = threading.Lock()
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def _trava_exclusiva(arquivo):
+    # Trava o arquivo inteiro entre processos (flock) ou, sem fcntl, entre threads
+    if fcntl is None:
+        with _TRAVA_LOCAL:
+            yield
+        return
+    fcntl.flock(arquivo.fileno(), fcntl.LOCK_EX)
+    try:
+        yield
+    finally:
+        fcntl.flock(arquivo.fileno(), fcntl.LOCK_UN)
+
+
+class ArmazenamentoSQLite:
+    """Armazenamento padrão: SQLite em modo WAL, uma linha por resposta."""
+
+    def __init__(self, caminho=BANCO_PADRAO):
+        self.caminho = caminho
+        self._local = threading.local()
+        con = self._conexao()
+        con.execute("PRAGMA journal_mode=WAL")
+        colunas_sql = ", ".join(f'"{col}" TEXT' for col in COLUNAS)
+        with con:
+            con.execute(
+                f"CREATE TABLE IF NOT EXISTS respostas "
+                f"(id INTEGER PRIMARY KEY AUTOINCREMENT, {colunas_sql})"
+            )
+
+    def _conexao(self):
+        # Cada thread do Streamlit usa sua própria conexão
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.caminho, timeout=30)
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+        return con
+
+    def _sql_insercao(self):
+        nomes = ", ".join(f'"{col}"' for col in COLUNAS)
+        marcadores = ", ".join("?" for _ in COLUNAS)
+        return f"INSERT INTO respostas ({nomes}) VALUES ({marcadores})"
+
+    def adicionar(self, resposta):
+        self.adicionar_lote([resposta])
+
+    def adicionar_lote(self, respostas):
+        linhas = [tuple(resposta.get(col) for col in COLUNAS) for resposta in respostas]
+        con = self._conexao()
+        with con:
+            con.executemany(self._sql_insercao(), linhas)
+
+    def ler(self, desde=0):
+        # Retorna as respostas com id > desde e a nova posição de leitura
+        nomes = ", ".join(f'"{col}"' for col in COLUNAS)
+        df = pd.read_sql_query(
+            f"SELECT id, {nomes} FROM respostas WHERE id > ? ORDER BY id",
+            self._conexao(),
+            params=(desde,),
+        )
+        posicao = int(df["id"].iloc[-1]) if len(df) else desde
+        return df.drop(columns="id"), posicao
+
+    def carregar(self):
+        return self.ler()[0]
+
+    def ler_em_blocos(self, tamanho_bloco=50000, limite=None):
+        # Percorre as respostas em ordem, no máximo `limite` linhas, sem carregar tudo
+        nomes = ", ".join(f'"{col}"' for col in COLUNAS)
+        cursor = self._conexao().execute(
+            f"SELECT {nomes} FROM respostas ORDER BY id LIMIT ?",
+            (-1 if limite is None else limite,),
+        )
+        while True:
+            linhas = cursor.fetchmany(tamanho_bloco)
+            if not linhas:
+                break
+            yield pd.DataFrame.from_records(linhas, columns=COLUNAS)
+
+    def ler_em_blocos_desde(self, desde=0, tamanho_bloco=50000):
+        # Como `ler`, mas em blocos: devolve (bloco, id da última resposta do bloco).
+        # O índice da chave primária leva direto às respostas novas
+        nomes = ", ".join(f'"{col}"' for col in COLUNAS)
+        cursor = self._conexao().execute(
+            f"SELECT id, {nomes} FROM respostas WHERE id > ? ORDER BY id", (desde,)
+        )
+        while True:
+            linhas = cursor.fetchmany(tamanho_bloco)
+            if not linhas:
+                break
+            bloco = pd.DataFrame.from_records(linhas, columns=["id"] + COLUNAS)
+            yield bloco.drop(columns="id"), int(bloco["id"].iloc[-1])
+
+    def total(self):
+        return self._conexao().execute("SELECT COUNT(*) FROM respostas").fetchone()[0]
+
+    def marcador(self):
+        # Maior id gravado por qualquer processo; igual à posição de `ler` quando não há nada novo
+        return self._conexao().execute("SELECT COALESCE(MAX(id), 0) FROM respostas").fetchone()[0]
+
+    def importar_se_vazio(self, caminho_csv, tamanho_lote=5000):
+        # Importação única: só ocorre se a tabela ainda estiver vazia.
+        # BEGIN IMMEDIATE impede que dois processos importem ao mesmo tempo.
+        if not os.path.exists(caminho_csv):
+            return 0
+        con = self._conexao()
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            if con.execute("SELECT COUNT(*) FROM respostas").fetchone()[0] > 0:
+                con.rollback()
+                return 0
+            total = 0
+            for registros in _ler_csv_em_lotes(caminho_csv, tamanho_lote):
+                con.executemany(
+                    self._sql_insercao(),
+                    [tuple(r.get(col) for col in COLUNAS) for r in registros],
+                )
+                total += len(registros)
+            con.commit()
+        except Exception:
+            con.rollback()
+            raise
+        return total
+
+
+class ArmazenamentoCSV:
+    """Armazenamento em CSV somente-anexação, protegido por trava de arquivo."""
+
+    def __init__(self, caminho=CSV_LEGADO):
+        self.caminho = caminho
+        self._cabecalho = None
+
+    def _colunas_arquivo(self):
+        if self._cabecalho is None:
+            with open(self.caminho, newline="", encoding="utf-8") as f:
+                self._cabecalho = next(csv.reader(f), None) or list(COLUNAS)
+        return self._cabecalho
+
+    def adicionar(self, resposta):
+        self.adicionar_lote([resposta])
+
+    def adicionar_lote(self, respostas):
+        with open(self.caminho, "a", newline="", encoding="utf-8") as f:
+            with _trava_exclusiva(f):
+                escritor = csv.writer(f, lineterminator="\n")
+                f.seek(0, os.SEEK_END)
+                if f.tell() == 0:
+                    escritor.writerow(COLUNAS)
+                    self._cabecalho = list(COLUNAS)
+                colunas = self._colunas_arquivo()
+                for resposta in respostas:
+                    escritor.writerow([resposta.get(col) for col in colunas])
+                f.flush()
+
+    def ler(self, desde=0):
+        # Lê a partir do deslocamento em bytes `desde`, ignorando uma linha
+        # final incompleta que ainda esteja sendo escrita por outro processo
+        if not os.path.exists(self.caminho):
+            return pd.DataFrame(), desde
+        with open(self.caminho, "rb") as f:
+            f.seek(desde)
+            bloco = f.read()
+        fim = bloco.rfind(b"\n") + 1
+        if fim == 0:
+            return pd.DataFrame(columns=self._colunas_arquivo()), desde
+        if desde == 0:
+            df = pd.read_csv(io.BytesIO(bloco[:fim]))
+            self._cabecalho = list(df.columns)
+        else:
+            df = pd.read_csv(io.BytesIO(bloco[:fim]), header=None, names=self._colunas_arquivo())
+        return df, desde + fim
+
+    def carregar(self):
+        return self.ler()[0]
+
+    def ler_em_blocos(self, tamanho_bloco=50000, limite=None):
+        if not os.path.exists(self.caminho):
+            return
+        yield from pd.read_csv(self.caminho, chunksize=tamanho_bloco, nrows=limite)
+
+    def ler_em_blocos_desde(self, desde=0, tamanho_bloco=50000):
+        # Como `ler`, mas em blocos de até `tamanho_bloco` linhas: devolve
+        # (bloco, deslocamento em bytes após o bloco). Uma linha final
+        # incompleta fica para a próxima leitura
+        if not os.path.exists(self.caminho):
+            return
+        with open(self.caminho, "rb") as f:
+            f.seek(desde)
+            if desde == 0:
+                cabecalho = f.readline()
+                if not cabecalho.endswith(b"\n"):
+                    return
+                self._cabecalho = next(csv.reader([cabecalho.decode("utf-8")]))
+                desde = len(cabecalho)
+            colunas = self._colunas_arquivo()
+            while True:
+                linhas = list(itertools.islice(f, tamanho_bloco))
+                completo = len(linhas) == tamanho_bloco
+                if linhas and not linhas[-1].endswith(b"\n"):
+                    linhas.pop()
+                    completo = False
+                if not linhas:
+                    return
+                desde += sum(map(len, linhas))
+                yield pd.read_csv(io.BytesIO(b"".join(linhas)), header=None, names=colunas), desde
+                if not completo:
+                    return
+
+    def total(self):
+        return sum(len(bloco) for bloco in self.ler_em_blocos())
+
+    def marcador(self):
+        # Tamanho do arquivo em bytes, comparável ao deslocamento devolvido por `ler`
+        try:
+            return os.path.getsize(self.caminho)
+        except OSError:
+            return 0
+
+
+class EscritorEmLote:
+    """Grava respostas em segundo plano, agrupando várias em uma só transação.
+
+    `enviar` só coloca a resposta numa fila limitada e retorna em tempo
+    constante. Uma thread esvazia a fila em lotes de até `tamanho_lote`
+    respostas, ou a cada `intervalo` segundos, o que vier primeiro. Com a fila
+    cheia, `enviar` espera até `espera_maxima` segundos e então levanta
+    queue.Full (contrapressão). Ao encerrar o processo, o que estiver na fila
+    é gravado antes de sair.
+
+    Um lote que falha é tentado de novo até `tentativas` vezes, com espera
+    crescente; depois disso as respostas vão, uma por linha em JSON, para
+    `arquivo_falhas` (por padrão ao lado do armazenamento) e a fila segue.
+    """
+
+    _FIM = object()
+
+    def __init__(self, destino, tamanho_lote=100, intervalo=0.2, capacidade=10000, espera_maxima=2.0,
+                 tentativas=TENTATIVAS_GRAVACAO, arquivo_falhas=None):
+        self.destino = destino
+        self.tamanho_lote = tamanho_lote
+        self.intervalo = intervalo
+        self.espera_maxima = espera_maxima
+        self.tentativas = tentativas
+        self.arquivo_falhas = arquivo_falhas or f"{destino.caminho}.falhas.jsonl"
+        self.gravadas = 0
+        self.lotes = 0
+        self.tentativas_falhas = 0
+        self.lotes_com_falha = 0
+        self.desviadas = 0
+        self._fila = queue.Queue(maxsize=capacidade)
+        self._thread = threading.Thread(target=self._executar, name="escritor-respostas", daemon=True)
+        self._thread.start()
+        atexit.register(self.fechar)
+
+    @property
+    def pendentes(self):
+        return self._fila.qsize()
+
+    def enviar(self, resposta):
+        self._fila.put(resposta, timeout=self.espera_maxima)
+
+    def descarregar(self):
+        # Bloqueia até que tudo o que foi enviado esteja gravado
+        self._fila.join()
+
+    def fechar(self):
+        if self._thread.is_alive():
+            self._fila.put(self._FIM)
+            self._thread.join()
+
+    def _executar(self):
+        encerrar = False
+        while not encerrar:
+            item = self._fila.get()
+            if item is self._FIM:
+                self._fila.task_done()
+                break
+            lote = [item]
+            limite = time.monotonic() + self.intervalo
+            while len(lote) < self.tamanho_lote:
+                restante = limite - time.monotonic()
+                try:
+                    item = self._fila.get(timeout=restante) if restante > 0 else self._fila.get_nowait()
+                except queue.Empty:
+                    break
+                if item is self._FIM:
+                    self._fila.task_done()
+                    encerrar = True
+                    break
+                lote.append(item)
+            self._gravar(lote)
+
+    def _gravar(self, lote):
+        # Em caso de erro o lote é tentado de novo, com espera dobrando a cada
+        # vez; esgotadas as tentativas ele é desviado e a fila não fica parada
+        espera = self.intervalo
+        for tentativa in range(1, self.tentativas + 1):
+            try:
+                self.destino.adicionar_lote(lote)
+            except Exception:
+                self.tentativas_falhas += 1
+                logger.exception(
+                    "Falha ao gravar lote de %d respostas (tentativa %d de %d)", len(lote), tentativa, self.tentativas
+                )
+                if tentativa < self.tentativas:
+                    time.sleep(espera)
+                    espera = min(2 * espera, ESPERA_MAXIMA_TENTATIVA)
+            else:
+                self.gravadas += len(lote)
+                self.lotes += 1
+                break
+        else:
+            self.lotes_com_falha += 1
+            self._desviar(lote)
+        for _ in lote:
+            self._fila.task_done()
+
+    def _desviar(self, lote):
+        # Arquivo de falhas: uma resposta por linha, para regravar depois
+        try:
+            with open(self.arquivo_falhas, "a", encoding="utf-8") as f:
+                for resposta in lote:
+                    f.write(json.dumps(resposta, ensure_ascii=False, default=str) + "\n")
+        except OSError:
+            logger.exception("Não foi possível guardar %d respostas em %s; elas foram perdidas",
+                             len(lote), self.arquivo_falhas)
+            return
+        self.desviadas += len(lote)
+        logger.error("Lote de %d respostas guardado em %s após %d tentativas",
+                     len(lote), self.arquivo_falhas, self.tentativas)
+
+
+def _ler_csv_em_lotes(caminho_csv, tamanho_lote):
+    for bloco in pd.read_csv(caminho_csv, chunksize=tamanho_lote, dtype=str):
+        yield bloco.astype(object).where(bloco.notna(), None).to_dict("records")
+
+
+def importar_csv(caminho_csv, destino, tamanho_lote=5000):
+    # Copia um CSV existente para qualquer armazenamento, em lotes
+    total = 0
+    for registros in _ler_csv_em_lotes(caminho_csv, tamanho_lote):
+        destino.adicionar_lote(registros)
+        total += len(registros)
+    return total
+
+
+def criar_armazenamento(tipo=None, caminho=None):
+    # Backend escolhido por PESQUISA_ARMAZENAMENTO ("sqlite" ou "csv")
+    tipo = tipo or os.environ.get("PESQUISA_ARMAZENAMENTO", "sqlite")
+    if tipo == "csv":
+        return ArmazenamentoCSV(caminho or os.environ.get("PESQUISA_CSV", CSV_LEGADO))
+    if tipo == "sqlite":
+        armazenamento = ArmazenamentoSQLite(caminho or os.environ.get("PESQUISA_DB", BANCO_PADRAO))
+        armazenamento.importar_se_vazio(CSV_LEGADO)
+        return armazenamento
+    raise ValueError(f"Tipo de armazenamento desconhecido: {tipo}")
+
+
+if __name__ == "__main__":
+    # Uso: python armazenamento.py respostas_prep.csv [respostas_prep.db]
+    if len(sys.argv) < 2:
+        print("Uso: python armazenamento.py <arquivo.csv> [banco.db]")
+        sys.exit(1)
+    destino = ArmazenamentoSQLite(sys.argv[2] if len(sys.argv) > 2 else BANCO_PADRAO)
+    print(f"{importar_csv(sys.argv[1], destino)} respostas importadas")
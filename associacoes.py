@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+from scipy.stats import chi2
+
+# Nível de significância usado para marcar as associações na página
+ALFA = 0.05
+
+CORRECOES = {"Benjamini-Hochberg": "p_bh", "Holm": "p_holm"}
+
+
+def testar_pares(tabelas):
+    """Teste qui-quadrado de independência e V de Cramér para várias tabelas de uma vez.
+
+    `tabelas` é um dicionário (pergunta_a, pergunta_b) -> matriz de contagens.
+    As matrizes, de tamanhos diferentes, são copiadas para um único arranjo 3D
+    preenchido com zeros, e todas as estatísticas saem de operações sobre esse
+    arranjo. Linhas e colunas sem nenhuma resposta não contam nos graus de
+    liberdade; pares com menos de duas opções usadas ficam com p e V nulos.
+    """
+    pares = list(tabelas)
+    formas = np.array([np.shape(tabelas[par]) for par in pares])
+    observados = np.zeros((len(pares), formas[:, 0].max(), formas[:, 1].max()))
+    for i, par in enumerate(pares):
+        observados[i, :formas[i, 0], :formas[i, 1]] = tabelas[par]
+
+    n = observados.sum(axis=(1, 2))
+    soma_linhas = observados.sum(axis=2)
+    soma_colunas = observados.sum(axis=1)
+    esperados = soma_linhas[:, :, None] * soma_colunas[:, None, :] / np.maximum(n, 1)[:, None, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        parcelas = np.where(esperados > 0, (observados - esperados) ** 2 / esperados, 0.0)
+    estatistica = parcelas.sum(axis=(1, 2))
+
+    linhas_usadas = (soma_linhas > 0).sum(axis=1)
+    colunas_usadas = (soma_colunas > 0).sum(axis=1)
+    gl = (linhas_usadas - 1) * (colunas_usadas - 1)
+    validos = gl > 0
+    p = np.where(validos, chi2.sf(estatistica, np.maximum(gl, 1)), np.nan)
+    menor_dimensao = np.maximum(np.minimum(linhas_usadas, colunas_usadas) - 1, 1)
+    v = np.where(validos, np.sqrt(estatistica / (np.maximum(n, 1) * menor_dimensao)), np.nan)
+
+    resultado = pd.DataFrame({
+        "pergunta_a": [a for a, _ in pares],
+        "pergunta_b": [b for _, b in pares],
+        "n": n.astype(np.int64),
+        "qui2": estatistica,
+        "gl": gl,
+        "p": p,
+        "v_cramer": v,
+        "p_bh": benjamini_hochberg(p),
+        "p_holm": holm(p),
+    })
+    return resultado.sort_values("v_cramer", ascending=False, ignore_index=True)
+
+
+def _ajustar(p, escalar):
+    # Aplica a correção apenas aos p-valores definidos, na ordem crescente
+    p = np.asarray(p, dtype=np.float64)
+    ajustados = np.full_like(p, np.nan)
+    definidos = ~np.isnan(p)
+    m = int(definidos.sum())
+    if m == 0:
+        return ajustados
+    valores = p[definidos]
+    ordem = np.argsort(valores, kind="stable")
+    corrigidos = np.empty(m)
+    corrigidos[ordem] = np.minimum(escalar(valores[ordem], m), 1.0)
+    ajustados[definidos] = corrigidos
+    return ajustados
+
+
+def benjamini_hochberg(p):
+    # Controle da taxa de falsas descobertas (FDR)
+    def escalar(ordenados, m):
+        escalados = ordenados * m / np.arange(1, m + 1)
+        return np.minimum.accumulate(escalados[::-1])[::-1]
+    return _ajustar(p, escalar)
+
+
+def holm(p):
+    # Controle do erro familiar (FWER), passo a passo
+    def escalar(ordenados, m):
+        return np.maximum.accumulate(ordenados * (m - np.arange(m)))
+    return _ajustar(p, escalar)
+
+
+def matriz_associacoes(resultado, colunas, coluna_p=None, ordenar=False):
+    """V de Cramér de cada par em uma matriz simétrica (pergunta x pergunta).
+
+    Com `coluna_p`, pares não significativos após a correção ficam vazios;
+    com `ordenar`, as perguntas seguem a força média de suas associações.
+    """
+    matriz = pd.DataFrame(np.nan, index=colunas, columns=colunas)
+    for linha in resultado.itertuples(index=False):
+        valor = linha.v_cramer
+        if coluna_p is not None and not getattr(linha, coluna_p) < ALFA:
+            valor = np.nan
+        matriz.loc[linha.pergunta_a, linha.pergunta_b] = valor
+        matriz.loc[linha.pergunta_b, linha.pergunta_a] = valor
+    if ordenar:
+        ordem = matriz.mean(axis=1).sort_values(ascending=False).index
+        matriz = matriz.loc[ordem, ordem]
+    return matriz
@@ -0,0 +1,185 @@
+"""Benchmark dos caminhos críticos do aplicativo com respostas sintéticas.
+
+Uso:
+
+    python -m benchmarks.executar --tamanhos 10000 100000 1000000 --saida resultados.json
+
+O resultado é um JSON com uma entrada por tamanho, para acompanhar a
+escalabilidade entre versões do código.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from agregacoes import Agregacoes
+from armazenamento import ArmazenamentoCSV, ArmazenamentoSQLite, EscritorEmLote
+from cache_dados import DadosCompartilhados
+from esquema import categorizar
+import exportacao
+from benchmarks.gerador import gerar_resposta, gerar_respostas
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def cronometrar(funcao, repeticoes=1):
+    amostras = []
+    resultado = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        amostras.append(time.perf_counter() - inicio)
+    return resultado, amostras
+
+
+def resumo(amostras):
+    ordenadas = sorted(amostras)
+    return {
+        "n": len(amostras),
+        "mediana_s": statistics.median(ordenadas),
+        "p95_s": ordenadas[min(len(ordenadas) - 1, int(0.95 * len(ordenadas)))],
+        "max_s": ordenadas[-1],
+    }
+
+
+def medir_insercao(armazenamento, anexos):
+    # Latência de cada chamada feita por salvar_dados com o arquivo já populado
+    respostas = [gerar_resposta(semente=i) for i in range(anexos)]
+    gravar = armazenamento.enviar if isinstance(armazenamento, EscritorEmLote) else armazenamento.adicionar
+    amostras = []
+    for resposta in respostas:
+        inicio = time.perf_counter()
+        gravar(resposta)
+        amostras.append(time.perf_counter() - inicio)
+    return resumo(amostras)
+
+
+def medir_tamanho(n, diretorio, anexos=200, repeticoes=3, agrupamento=True):
+    resultado = {"respostas": n}
+    dados_brutos = gerar_respostas(n)
+    registros = dados_brutos.to_dict("records")
+
+    sqlite = ArmazenamentoSQLite(os.path.join(diretorio, f"bench_{n}.db"))
+    _, t = cronometrar(lambda: sqlite.adicionar_lote(registros))
+    resultado["carga_inicial_sqlite_s"] = t[0]
+    csv = ArmazenamentoCSV(os.path.join(diretorio, f"bench_{n}.csv"))
+    _, t = cronometrar(lambda: csv.adicionar_lote(registros))
+    resultado["carga_inicial_csv_s"] = t[0]
+
+    resultado["salvar_dados_sqlite"] = medir_insercao(sqlite, anexos)
+    resultado["salvar_dados_csv"] = medir_insercao(csv, anexos)
+    escritor = EscritorEmLote(sqlite)
+    resultado["salvar_dados_em_lote"] = medir_insercao(escritor, anexos)
+    _, t = cronometrar(escritor.descarregar)
+    resultado["salvar_dados_em_lote"]["descarga_s"] = t[0]
+    resultado["salvar_dados_em_lote"]["lotes"] = escritor.lotes
+    escritor.fechar()
+    total = n + 2 * anexos
+
+    _, t = cronometrar(lambda: DadosCompartilhados(sqlite).atualizar(), repeticoes)
+    resultado["carregamento_sqlite"] = resumo(t)
+    _, t = cronometrar(lambda: DadosCompartilhados(csv).atualizar(), repeticoes)
+    resultado["carregamento_csv"] = resumo(t)
+
+    compartilhados = DadosCompartilhados(sqlite)
+    compartilhados.atualizar()
+    dados = compartilhados.dados
+    resultado["memoria_dados_mb"] = dados.memory_usage(deep=True).sum() / 2**20
+    resultado["memoria_texto_mb"] = sqlite.carregar().memory_usage(deep=True).sum() / 2**20
+
+    # Agregações: construção incremental, consulta memorizada e pandas direto
+    agregacoes = Agregacoes()
+    _, t = cronometrar(lambda: agregacoes.adicionar(dados))
+    resultado["agregacoes_construcao_s"] = t[0]
+
+    def consultar():
+        agregacoes.contagem("Conhecimento_PrEP")
+        agregacoes.tabela("Genero", "Conhecimento_PrEP")
+        agregacoes.tabela("Faixa_etaria", "Conhecimento_PrEP")
+        agregacoes.descricao()
+    _, t = cronometrar(consultar, repeticoes)
+    resultado["agregacoes_consulta"] = resumo(t)
+    unica = gerar_respostas(1, semente=7)
+    _, t = cronometrar(lambda: agregacoes.adicionar(categorizar(unica)), repeticoes)
+    resultado["agregacoes_anexo"] = resumo(t)
+
+    # Qui-quadrado de todos os pares (primeira chamada da versão, sem memória):
+    # depende só das tabelas, não do número de linhas
+    agregacoes.adicionar(categorizar(gerar_respostas(1, semente=8)))
+    _, t = cronometrar(agregacoes.associacoes)
+    resultado["associacoes_s"] = t[0]
+
+    def pandas_direto():
+        dados["Conhecimento_PrEP"].value_counts()
+        pd.crosstab(dados["Genero"], dados["Conhecimento_PrEP"])
+        pd.crosstab(dados["Faixa_etaria"], dados["Conhecimento_PrEP"])
+        dados.describe(include="all")
+    _, t = cronometrar(pandas_direto, repeticoes)
+    resultado["agregacoes_pandas"] = resumo(t)
+
+    if agrupamento:
+        from agrupamento import PipelineAgrupamento
+        pipeline = PipelineAgrupamento()
+        _, t = cronometrar(lambda: pipeline.ajustar(dados))
+        resultado["agrupamento_ajuste_s"] = t[0]
+        _, t = cronometrar(lambda: pipeline.resultado(dados), repeticoes)
+        resultado["agrupamento_resultado_em_cache"] = resumo(t)
+
+    destino = os.path.join(diretorio, f"exportacoes_{n}")
+    for formato in ("CSV", "CSV compactado (gzip)"):
+        _, t = cronometrar(lambda: exportacao.exportar(sqlite, formato, total, destino))
+        _, t_cache = cronometrar(lambda: exportacao.exportar(sqlite, formato, total, destino))
+        resultado[f"exportacao_{formato}"] = {"primeira_s": t[0], "em_cache_s": t_cache[0]}
+
+    return resultado
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=RAIZ, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def executar(tamanhos, anexos=200, repeticoes=3, agrupamento=True):
+    diretorio = tempfile.mkdtemp(prefix="bench_prep_")
+    try:
+        return {
+            "data": datetime.now().isoformat(timespec="seconds"),
+            "commit": _commit(),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "pandas": pd.__version__,
+            "resultados": [
+                medir_tamanho(n, diretorio, anexos, repeticoes, agrupamento) for n in tamanhos
+            ],
+        }
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--anexos", type=int, default=200, help="respostas anexadas por tamanho")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--sem-agrupamento", action="store_true")
+    parser.add_argument("--saida", help="arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args()
+    relatorio = executar(args.tamanhos, args.anexos, args.repeticoes, not args.sem_agrupamento)
+    texto = json.dumps(relatorio, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            f.write(texto)
+    else:
+        print(texto)
@@ -0,0 +1,47 @@
+"""Gerador de respostas sintéticas a partir das opções do formulário."""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from esquema import COLUNAS, METODOS_PREVENCAO, OPCOES
+
+
+def gerar_respostas(n, semente=42, inicio=datetime(2025, 1, 1), dias=90):
+    """Retorna `n` respostas no mesmo formato gravado por salvar_dados.
+
+    Cada pergunta recebe pesos aleatórios fixos (Dirichlet) para que as
+    distribuições não sejam uniformes, e as perguntas de conhecimento são
+    correlacionadas entre si, como em respostas reais.
+    """
+    rng = np.random.default_rng(semente)
+    colunas = {}
+    for col, opcoes in OPCOES.items():
+        pesos = rng.dirichlet(np.full(len(opcoes), 2.0))
+        colunas[col] = rng.choice(len(opcoes), size=n, p=pesos)
+    # Quem conhece a PrEP tende a conhecer a PEP
+    mesma = rng.random(n) < 0.6
+    colunas["Conhecimento_PEP"] = np.where(mesma, colunas["Conhecimento_PrEP"], colunas["Conhecimento_PEP"])
+
+    dados = {
+        col: pd.Categorical.from_codes(codigos, OPCOES[col]).astype(str)
+        for col, codigos in colunas.items()
+    }
+
+    # Múltipla escolha: cada método é marcado de forma independente
+    marcados = rng.random((n, len(METODOS_PREVENCAO))) < rng.uniform(0.05, 0.5, len(METODOS_PREVENCAO))
+    metodos = np.array(METODOS_PREVENCAO, dtype=object)
+    dados["Metodos_prevencao"] = [", ".join(metodos[linha]) for linha in marcados]
+
+    segundos = np.sort(rng.integers(0, dias * 86400, size=n))
+    dados["timestamp"] = (
+        pd.Timestamp(inicio) + pd.to_timedelta(segundos, unit="s")
+    ).strftime("%Y-%m-%d %H:%M:%S")
+
+    return pd.DataFrame(dados)[COLUNAS]
+
+
+def gerar_resposta(semente=None):
+    # Uma única resposta como dicionário, igual à montada pelo formulário
+    resposta = gerar_respostas(1, semente=semente, inicio=datetime.now() - timedelta(days=1), dias=1)
+    return resposta.iloc[0].to_dict()
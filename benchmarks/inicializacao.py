@@ -0,0 +1,131 @@
+"""Mede o custo de inicialização a frio das páginas do aplicativo.
+
+Cada medição roda em um processo Python novo, como em um worker recém
+iniciado, dentro de um diretório temporário com `--respostas` respostas
+sintéticas em respostas_prep.csv (importado pelo armazenamento como em uma
+instalação existente). Uso:
+
+    python -m benchmarks.inicializacao [--repeticoes 5] [--respostas 1000]
+    python -m benchmarks.inicializacao --raiz /caminho/de/outra/versao
+
+Com --raiz, mede as páginas de outra cópia do código (ex.: um `git worktree`
+de uma versão anterior), para comparar antes e depois. Os módulos medidos
+na importação são os importados no nível de módulo de cada página.
+"""
+import argparse
+import ast
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PAGINAS = {
+    "formulario": "questionario_prep.py",
+    "analise": os.path.join("pages", "1_Analise_dos_Dados.py"),
+}
+
+_MEDIR_IMPORTACAO = """
+import sys, time
+inicio = time.perf_counter()
+for modulo in sys.argv[1:]:
+    __import__(modulo)
+print(time.perf_counter() - inicio)
+"""
+
+# Primeira execução completa do script da página (equivale ao primeiro "paint")
+_MEDIR_PAGINA = """
+import sys, time
+inicio = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+AppTest.from_file(sys.argv[1], default_timeout=300).run()
+print(time.perf_counter() - inicio)
+"""
+
+
+def importacoes_da_pagina(caminho):
+    # Módulos importados no nível de módulo do script (como a página os importa)
+    with open(caminho, encoding="utf-8") as f:
+        arvore = ast.parse(f.read())
+    modulos = []
+    for no in arvore.body:
+        if isinstance(no, ast.Import):
+            nomes = [alias.name for alias in no.names]
+        elif isinstance(no, ast.ImportFrom) and no.module and not no.level:
+            nomes = [no.module]
+        else:
+            continue
+        modulos += [nome for nome in nomes if nome not in modulos]
+    return modulos
+
+
+def _em_processo_novo(codigo, raiz, diretorio, *argumentos):
+    ambiente = dict(os.environ, PYTHONPATH=raiz)
+    for variavel in ("PESQUISA_DB", "PESQUISA_CSV", "PESQUISA_ARMAZENAMENTO", "PESQUISA_MODO_ANALISE"):
+        ambiente.pop(variavel, None)
+    saida = subprocess.run(
+        [sys.executable, "-c", codigo, *argumentos],
+        cwd=diretorio, env=ambiente, capture_output=True, text=True, check=True,
+    )
+    return float(saida.stdout.strip().splitlines()[-1])
+
+
+def _resumo(amostras):
+    return {
+        "mediana_s": statistics.median(amostras),
+        "min_s": min(amostras),
+        "max_s": max(amostras),
+        "amostras": amostras,
+    }
+
+
+def _preparar(diretorio, respostas):
+    # Um diretório novo por amostra: nenhum banco ou cache sobra da anterior
+    from benchmarks.gerador import gerar_respostas
+    os.makedirs(diretorio)
+    gerar_respostas(respostas).to_csv(os.path.join(diretorio, "respostas_prep.csv"), index=False)
+
+
+def medir(repeticoes=5, respostas=1000, raiz=RAIZ):
+    raiz = os.path.abspath(raiz)
+    resultado = {"raiz": raiz, "respostas": respostas, "importacao": {}, "primeira_execucao": {}}
+    temporario = tempfile.mkdtemp(prefix="inicializacao_prep_")
+    try:
+        for pagina, arquivo in PAGINAS.items():
+            caminho = os.path.join(raiz, arquivo)
+            if not os.path.exists(caminho):
+                continue
+            modulos = importacoes_da_pagina(caminho)
+            amostras = []
+            for i in range(repeticoes):
+                diretorio = os.path.join(temporario, f"{pagina}_importacao_{i}")
+                _preparar(diretorio, respostas)
+                amostras.append(_em_processo_novo(_MEDIR_IMPORTACAO, raiz, diretorio, *modulos))
+            resultado["importacao"][pagina] = dict(_resumo(amostras), modulos=modulos)
+            try:
+                amostras = []
+                for i in range(repeticoes):
+                    diretorio = os.path.join(temporario, f"{pagina}_execucao_{i}")
+                    _preparar(diretorio, respostas)
+                    amostras.append(_em_processo_novo(_MEDIR_PAGINA, raiz, diretorio, caminho))
+            except subprocess.CalledProcessError as e:
+                # streamlit.testing só existe a partir do Streamlit 1.28
+                resultado["primeira_execucao"][pagina] = {"erro": e.stderr.strip().splitlines()[-1]}
+            else:
+                resultado["primeira_execucao"][pagina] = _resumo(amostras)
+    finally:
+        shutil.rmtree(temporario, ignore_errors=True)
+    return resultado
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--respostas", type=int, default=1000, help="respostas sintéticas no armazenamento")
+    parser.add_argument("--raiz", default=RAIZ, help="cópia do código a medir (padrão: esta)")
+    args = parser.parse_args()
+    print(json.dumps(medir(args.repeticoes, args.respostas, args.raiz), indent=2, ensure_ascii=False))
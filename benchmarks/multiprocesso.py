@@ -0,0 +1,108 @@
+"""Teste de carga com vários processos gravando no mesmo armazenamento.
+
+Uso:
+
+    python -m benchmarks.multiprocesso --processos 1 2 4 8 --respostas 2000 --armazenamento sqlite
+
+Cada processo simula uma instância do aplicativo atrás de um balanceador:
+envia suas respostas pelo EscritorEmLote, como salvar_dados. O processo
+principal faz o papel de outra instância só de leitura e mede quanto tempo
+leva para enxergar todas as respostas com DadosCompartilhados.atualizar.
+O resultado é um JSON com a vazão total para cada número de processos.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from armazenamento import ArmazenamentoCSV, ArmazenamentoSQLite, EscritorEmLote
+from cache_dados import DadosCompartilhados
+from benchmarks.gerador import gerar_resposta
+
+# Tempo máximo esperando o leitor enxergar todas as respostas
+ESPERA_MAXIMA = 300
+
+
+def _abrir(tipo, caminho):
+    # Sem criar_armazenamento, para não importar o CSV legado do diretório atual
+    return ArmazenamentoSQLite(caminho) if tipo == "sqlite" else ArmazenamentoCSV(caminho)
+
+
+def _trabalhador(tipo, caminho, respostas, semente, barreira, resultados):
+    armazenamento = _abrir(tipo, caminho)
+    escritor = EscritorEmLote(armazenamento)
+    lote = [gerar_resposta(semente=semente * respostas + i) for i in range(respostas)]
+    barreira.wait()
+    inicio = time.perf_counter()
+    for resposta in lote:
+        escritor.enviar(resposta)
+    escritor.descarregar()
+    resultados.put(time.perf_counter() - inicio)
+    escritor.fechar()
+
+
+def medir_processos(processos, respostas, tipo, diretorio):
+    caminho = os.path.join(diretorio, f"carga_{processos}.{'db' if tipo == 'sqlite' else 'csv'}")
+    leitor = DadosCompartilhados(_abrir(tipo, caminho))
+    contexto = multiprocessing.get_context("spawn")
+    barreira = contexto.Barrier(processos + 1)
+    resultados = contexto.Queue()
+    trabalhadores = [
+        contexto.Process(target=_trabalhador, args=(tipo, caminho, respostas, i, barreira, resultados))
+        for i in range(processos)
+    ]
+    for trabalhador in trabalhadores:
+        trabalhador.start()
+
+    esperado = processos * respostas
+    barreira.wait()
+    inicio = time.perf_counter()
+    while leitor.atualizar() < esperado:
+        if time.perf_counter() - inicio > ESPERA_MAXIMA:
+            raise TimeoutError(f"O leitor viu {leitor.versao} de {esperado} respostas")
+        time.sleep(0.01)
+    visivel = time.perf_counter() - inicio
+
+    duracoes = [resultados.get() for _ in trabalhadores]
+    for trabalhador in trabalhadores:
+        trabalhador.join()
+    return {
+        "processos": processos,
+        "respostas": esperado,
+        "gravadas": leitor.versao,
+        "duracao_s": max(duracoes),
+        "respostas_por_s": esperado / max(duracoes),
+        "visivel_no_leitor_s": visivel,
+    }
+
+
+def executar(lista_processos, respostas=2000, tipo="sqlite"):
+    diretorio = tempfile.mkdtemp(prefix="carga_prep_")
+    try:
+        return {
+            "armazenamento": tipo,
+            "respostas_por_processo": respostas,
+            "cpus": os.cpu_count(),
+            "resultados": [medir_processos(n, respostas, tipo, diretorio) for n in lista_processos],
+        }
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processos", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--respostas", type=int, default=2000, help="respostas enviadas por processo")
+    parser.add_argument("--armazenamento", choices=["sqlite", "csv"], default="sqlite")
+    parser.add_argument("--saida", help="arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args()
+    relatorio = executar(args.processos, args.respostas, args.armazenamento)
+    texto = json.dumps(relatorio, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            f.write(texto)
+    else:
+        print(texto)
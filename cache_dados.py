@@ -0,0 +1,81 @@
+import logging
+import threading
+import time
+
+import pandas as pd
+
+from esquema import categorizar
+
+logger = logging.getLogger(__name__)
+
+
+class DadosCompartilhados:
+    """Conjunto de respostas carregado uma única vez por processo.
+
+    Guarda a posição já lida no armazenamento e, a cada atualização, busca
+    apenas as respostas novas. As sessões recebem o mesmo DataFrame e devem
+    tratá-lo como somente-leitura.
+
+    Com vários processos gravando no mesmo armazenamento, `observar` mantém
+    uma thread que confere o marcador do armazenamento (maior id no SQLite,
+    tamanho do arquivo no CSV) e incorpora o que os outros processos gravaram,
+    atualizando também os ouvintes (agregações, índices, séries).
+    """
+
+    def __init__(self, armazenamento):
+        self.armazenamento = armazenamento
+        self.posicao = 0
+        self.versao = 0
+        self._blocos = []
+        self._dados = pd.DataFrame()
+        self._ouvintes = []
+        self._trava = threading.Lock()
+
+    def inscrever(self, ouvinte):
+        # `ouvinte(bloco)` recebe cada bloco novo; o que já foi lido é repassado agora
+        with self._trava:
+            dados = self._consolidar()
+            if not dados.empty:
+                ouvinte(dados)
+            self._ouvintes.append(ouvinte)
+
+    def atualizar(self):
+        # Busca somente o que foi gravado depois da última leitura
+        with self._trava:
+            if self.armazenamento.marcador() == self.posicao:
+                return self.versao
+            novos, posicao = self.armazenamento.ler(self.posicao)
+            self.posicao = posicao
+            if len(novos):
+                novos = categorizar(novos)
+                self._blocos.append(novos)
+                self.versao += len(novos)
+                for ouvinte in self._ouvintes:
+                    ouvinte(novos)
+        return self.versao
+
+    def observar(self, intervalo=2.0):
+        # Verificação periódica em segundo plano; sem gravações novas custa
+        # uma consulta ao marcador por intervalo
+        def executar():
+            while True:
+                time.sleep(intervalo)
+                try:
+                    self.atualizar()
+                except Exception:
+                    logger.exception("Falha ao atualizar as respostas compartilhadas")
+
+        threading.Thread(target=executar, name="observador-respostas", daemon=True).start()
+
+    def _consolidar(self):
+        # Consolida os blocos pendentes uma vez por versão, não por sessão
+        if self._blocos:
+            blocos = [self._dados] if not self._dados.empty else []
+            self._dados = pd.concat(blocos + self._blocos, ignore_index=True)
+            self._blocos = []
+        return self._dados
+
+    @property
+    def dados(self):
+        with self._trava:
+            return self._consolidar()
@@ -0,0 +1,73 @@
+import numpy as np
+import scipy.sparse as sp
+
+from esquema import COLUNAS_CATEGORICAS, ESCALAS_ORDINAIS, METODOS_PREVENCAO, OPCOES, codigos
+
+
+class CodificadorRespostas:
+    """Transforma respostas em uma matriz esparsa de características.
+
+    - Perguntas ordenadas (ESCALAS_ORDINAIS) viram um valor entre 0 e 1, mais
+      um indicador para cada opção fora da escala;
+    - As demais perguntas viram colunas one-hot, uma por opção;
+    - Metodos_prevencao (múltipla escolha) vira um indicador por método.
+
+    O layout das colunas vem das listas de opções do formulário, então o
+    codificador não depende dos dados e pode ser criado uma vez e reutilizado.
+    """
+
+    def __init__(self, colunas=COLUNAS_CATEGORICAS, metodos=True):
+        self.colunas = list(colunas)
+        self.metodos = metodos
+        self.nomes = []
+        # Para cada pergunta: código da opção -> (coluna da matriz, valor)
+        self._destino = {}
+        self._valor = {}
+        for col in self.colunas:
+            opcoes = OPCOES[col]
+            destino = np.empty(len(opcoes), dtype=np.int64)
+            valor = np.ones(len(opcoes), dtype=np.float64)
+            escala = ESCALAS_ORDINAIS.get(col)
+            if escala is not None:
+                indice_escala = len(self.nomes)
+                self.nomes.append(col)
+            for codigo, opcao in enumerate(opcoes):
+                if escala is not None and opcao in escala:
+                    destino[codigo] = indice_escala
+                    valor[codigo] = escala.index(opcao) / (len(escala) - 1)
+                else:
+                    destino[codigo] = len(self.nomes)
+                    self.nomes.append(f"{col}={opcao}")
+            self._destino[col] = destino
+            self._valor[col] = valor
+        if metodos:
+            self._inicio_metodos = len(self.nomes)
+            self.nomes.extend(f"Metodos_prevencao={metodo}" for metodo in METODOS_PREVENCAO)
+
+    @property
+    def n_caracteristicas(self):
+        return len(self.nomes)
+
+    def transformar(self, dados):
+        matriz_codigos = codigos(dados, self.colunas)
+        linhas, colunas, valores = [], [], []
+        for j, col in enumerate(self.colunas):
+            codigo = matriz_codigos[:, j]
+            validas = np.flatnonzero(codigo >= 0)
+            linhas.append(validas)
+            colunas.append(self._destino[col][codigo[validas]])
+            valores.append(self._valor[col][codigo[validas]])
+        if self.metodos and "Metodos_prevencao" in dados.columns:
+            indicadores = (
+                dados["Metodos_prevencao"].fillna("").astype(str).str.get_dummies(sep=", ")
+                .reindex(columns=METODOS_PREVENCAO, fill_value=0)
+                .to_numpy()
+            )
+            linha, metodo = np.nonzero(indicadores)
+            linhas.append(linha)
+            colunas.append(metodo + self._inicio_metodos)
+            valores.append(np.ones(len(linha)))
+        return sp.csr_matrix(
+            (np.concatenate(valores), (np.concatenate(linhas), np.concatenate(colunas))),
+            shape=(len(dados), self.n_caracteristicas),
+        )
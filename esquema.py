@@ -0,0 +1,171 @@
+import numpy as np
+import pandas as pd
+
+# Opções de cada pergunta do formulário, na ordem em que são exibidas.
+# O formulário e a análise usam estas listas como única fonte.
+NIVEIS_CONHECIMENTO = [
+    "Sim, conheço bem",
+    "Conheço parcialmente",
+    "Já ouvi falar mas não sei detalhes",
+    "Não conheço"
+]
+
+OPCOES = {
+    "Conhecimento_PrEP": NIVEIS_CONHECIMENTO,
+    "Conhecimento_PEP": NIVEIS_CONHECIMENTO,
+    "Acesso_servicos": [
+        "Sim, conheço vários serviços",
+        "Conheço apenas um local",
+        "Não sei mas gostaria de saber",
+        "Não sei e não tenho interesse"
+    ],
+    "Fonte_informacao": [
+        "Profissional de saúde",
+        "Amigos/conhecidos",
+        "Internet/redes sociais",
+        "Material informativo (folhetos, cartazes)",
+        "Nunca ouvi falar",
+        "Outra fonte"
+    ],
+    "Uso_PrepPEP": [
+        "Sim, uso atualmente",
+        "Sim, já usei no passado",
+        "Não, mas pretendo usar",
+        "Não uso e não tenho interesse",
+        "Prefiro não responder"
+    ],
+    "Conhece_usuarios": [
+        "Sim, vários conhecidos",
+        "Sim, algumas pessoas",
+        "Não conheço ninguém",
+        "Prefiro não responder"
+    ],
+    "Teste_HIV_frequencia": [
+        "A cada 3 meses",
+        "A cada 6 meses",
+        "Uma vez por ano",
+        "Raramente faço",
+        "Nunca fiz",
+        "Prefiro não responder"
+    ],
+    "Genero": [
+        "Mulher cisgênero",
+        "Homem cisgênero",
+        "Mulher trans/transgênero",
+        "Homem trans/transgênero",
+        "Pessoa não-binária",
+        "Travesti",
+        "Agênero",
+        "Gênero fluido",
+        "Outro",
+        "Prefiro não responder"
+    ],
+    "Orientacao_sexual": [
+        "Assexual",
+        "Bissexual",
+        "Gay",
+        "Lésbica",
+        "Pansexual",
+        "Heterossexual",
+        "Queer",
+        "Outra",
+        "Prefiro não responder"
+    ],
+    "Raca": [
+        "Amarela (origem asiática)",
+        "Branca",
+        "Indígena",
+        "Parda",
+        "Preta",
+        "Prefiro não responder"
+    ],
+    "Faixa_etaria": [
+        "13-17", "18-24", "25-29", "30-39",
+        "40-49", "50-59", "60+", "Prefiro não responder"
+    ],
+    "Renda": [
+        "Até 1 salário mínimo",
+        "1-2 salários mínimos",
+        "2-3 salários mínimos",
+        "3-5 salários mínimos",
+        "Mais de 5 salários mínimos",
+        "Prefiro não responder"
+    ],
+    "Regiao": [
+        "Centro expandido",
+        "Zona Norte",
+        "Zona Sul",
+        "Zona Leste",
+        "Zona Oeste",
+        "Região Metropolitana",
+        "Não moro em São Paulo",
+        "Prefiro não responder"
+    ],
+}
+
+# Pergunta de múltipla escolha: gravada como texto separado por ", "
+METODOS_PREVENCAO = [
+    "PrEP",
+    "PEP",
+    "Camisinha masculina",
+    "Camisinha feminina",
+    "Testagem regular",
+    "Não utilizo métodos de prevenção",
+    "Outro"
+]
+
+# Perguntas com respostas ordenadas, do menor para o maior nível.
+# Opções fora da escala (ex.: "Prefiro não responder") ficam como indicador à parte.
+ESCALAS_ORDINAIS = {
+    "Conhecimento_PrEP": NIVEIS_CONHECIMENTO[::-1],
+    "Conhecimento_PEP": NIVEIS_CONHECIMENTO[::-1],
+    "Teste_HIV_frequencia": [
+        "Nunca fiz", "Raramente faço", "Uma vez por ano", "A cada 6 meses", "A cada 3 meses"
+    ],
+    "Renda": OPCOES["Renda"][:5],
+    "Faixa_etaria": OPCOES["Faixa_etaria"][:7],
+}
+
+COLUNAS_CATEGORICAS = list(OPCOES)
+
+# Colunas na ordem em que as respostas são gravadas
+COLUNAS = (
+    COLUNAS_CATEGORICAS[:7]
+    + ["Metodos_prevencao"]
+    + COLUNAS_CATEGORICAS[7:]
+    + ["timestamp"]
+)
+
+TIPOS = {col: pd.CategoricalDtype(opcoes) for col, opcoes in OPCOES.items()}
+
+
+def categorizar(df):
+    # Converte as colunas de opção fechada para categorias fixas (códigos int8)
+    # e o timestamp para datetime64, uma única vez por bloco lido
+    convertidas = {
+        col: df[col].astype(TIPOS[col])
+        for col in COLUNAS_CATEGORICAS
+        if col in df.columns and df[col].dtype != TIPOS[col]
+    }
+    if "timestamp" in df.columns and not pd.api.types.is_datetime64_any_dtype(df["timestamp"]):
+        convertidas["timestamp"] = pd.to_datetime(df["timestamp"], format="%Y-%m-%d %H:%M:%S", errors="coerce")
+    return df.assign(**convertidas) if convertidas else df
+
+
+def chave_filtros(filtros):
+    # Forma canônica (e hashable) de {coluna: [opções]}, sem as colunas vazias
+    return tuple(sorted((col, tuple(opcoes)) for col, opcoes in (filtros or {}).items() if opcoes))
+
+
+def codigos(df, colunas=None):
+    # Matriz (linhas x colunas) com os códigos das categorias; -1 = ausente
+    colunas = colunas or [col for col in COLUNAS_CATEGORICAS if col in df.columns]
+    matriz = np.empty((len(df), len(colunas)), dtype=np.int8)
+    for j, col in enumerate(colunas):
+        serie = df[col]
+        if serie.dtype != TIPOS[col]:
+            serie = serie.astype(TIPOS[col])
+        # Colunas já categorizadas: lê os códigos direto, sem copiar o DataFrame
+        matriz[:, j] = serie.cat.codes.to_numpy()
+    return matriz
+
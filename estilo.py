@@ -0,0 +1,97 @@
+import streamlit as st
+
+# CSS personalizado com melhor contraste
+CSS = """
+<style>
+    .main-header {
+        font-size: 3rem;
+        color: #1E90FF;
+        text-align: center;
+        margin-bottom: 2rem;
+    }
+    .section-header {
+        font-size: 1.8rem;
+        color: #4682B4;
+        border-bottom: 2px solid #1E90FF;
+        padding-bottom: 0.5rem;
+        margin-top: 2rem;
+    }
+    .stButton>button {
+        background-color: #1E90FF;
+        color: white;
+        font-weight: bold;
+        border: none;
+        padding: 0.8rem 1.5rem;
+        border-radius: 0.5rem;
+        margin-top: 1.5rem;
+    }
+    .stButton>button:hover {
+        background-color: #4682B4;
+    }
+    .success-box {
+        padding: 1.5rem;
+        border-radius: 0.5rem;
+        background-color: #E6F7FF;
+        border-left: 5px solid #1E90FF;
+        margin-bottom: 1.5rem;
+        color: #000000 !important;
+    }
+    .info-box {
+        padding: 1.5rem;
+        border-radius: 0.5rem;
+        background-color: #F0F8FF;
+        border-left: 5px solid #4682B4;
+        margin: 1rem 0;
+        color: #000000 !important;
+    }
+    .tech-card {
+        padding: 1rem;
+        border-radius: 0.5rem;
+        background-color: #F8F9FA;
+        border-left: 5px solid #28A745;
+        margin: 0.5rem 0;
+        color: #000000 !important;
+    }
+    .ml-explanation {
+        padding: 1.5rem;
+        border-radius: 0.5rem;
+        background-color: #FFFFFF;
+        border: 2px solid #6F42C1;
+        margin: 1rem 0;
+        color: #000000 !important;
+        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
+    }
+    /* Melhorar contraste para todo o texto */
+    .stMarkdown, .stText, .stAlert, .stInfo {
+        color: #000000 !important;
+    }
+    /* Garantir que todos os textos sejam visíveis */
+    div[data-testid="stMarkdownContainer"] {
+        color: #000000 !important;
+    }
+    /* Remover fundos brancos sobrepostos */
+    .stApp {
+        background-color: #FFFFFF;
+    }
+</style>
+"""
+
+
+def configurar_pagina(titulo="Pesquisa PrEP/HIV - São Paulo"):
+    # Deve ser a primeira chamada do Streamlit em cada página
+    st.set_page_config(
+        page_title=titulo,
+        page_icon="🏳️‍🌈",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
+    st.markdown(CSS, unsafe_allow_html=True)
+
+
+def rodape():
+    st.markdown("---")
+    st.markdown("""
+    <div style="text-align: center; color: #000000; margin-top: 2rem;">
+        <p>Desenvolvido com Streamlit | Pesquisa sobre Prevenção ao HIV</p>
+    </div>
+    """, unsafe_allow_html=True)
@@ -0,0 +1,102 @@
+import gzip
+import hashlib
+import os
+import threading
+
+# Formato -> (extensão, tipo MIME)
+FORMATOS = {
+    "CSV": (".csv", "text/csv"),
+    "CSV compactado (gzip)": (".csv.gz", "application/gzip"),
+    "Parquet": (".parquet", "application/vnd.apache.parquet"),
+}
+
+TAMANHO_BLOCO = 50000
+
+_trava = threading.Lock()
+
+
+def parquet_disponivel():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def formatos_disponiveis():
+    return [formato for formato in FORMATOS if formato != "Parquet" or parquet_disponivel()]
+
+
+def diretorio_configurado(armazenamento):
+    # Os arquivos têm as respostas completas: por padrão ficam ao lado do
+    # armazenamento, nunca no diretório temporário compartilhado da máquina
+    padrao = os.path.join(os.path.dirname(os.path.abspath(armazenamento.caminho)), "exportacoes")
+    return os.environ.get("PESQUISA_EXPORTACOES", padrao)
+
+
+def identidade(armazenamento):
+    # Distingue armazenamentos diferentes que usem o mesmo diretório de exportação
+    origem = f"{type(armazenamento).__name__}:{os.path.abspath(armazenamento.caminho)}"
+    return hashlib.blake2b(origem.encode("utf-8"), digest_size=6).hexdigest()
+
+
+def _escrever_csv(blocos, destino, compactar):
+    abrir = gzip.open if compactar else open
+    with abrir(destino, "wt", newline="", encoding="utf-8") as f:
+        for i, bloco in enumerate(blocos):
+            bloco.to_csv(f, index=False, header=(i == 0))
+
+
+def _escrever_parquet(blocos, destino):
+    # Cada bloco vira um row group; o arquivo nunca fica inteiro em memória
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    escritor = None
+    try:
+        for bloco in blocos:
+            tabela = pa.Table.from_pandas(bloco.astype(str).where(bloco.notna(), None), preserve_index=False)
+            if escritor is None:
+                escritor = pq.ParquetWriter(destino, tabela.schema)
+            escritor.write_table(tabela)
+    finally:
+        if escritor is not None:
+            escritor.close()
+
+
+def exportar(armazenamento, formato, versao, diretorio=None):
+    """Gera (ou reaproveita) o arquivo de exportação das primeiras `versao` respostas.
+
+    O arquivo é escrito bloco a bloco a partir do armazenamento e fica em
+    disco, identificado pelo armazenamento e pela versão; novos downloads da
+    mesma versão não custam nada. Diretório e arquivos são legíveis só pelo
+    usuário do aplicativo.
+    """
+    extensao, _ = FORMATOS[formato]
+    diretorio = diretorio or diretorio_configurado(armazenamento)
+    os.makedirs(diretorio, mode=0o700, exist_ok=True)
+    prefixo = f"dados_prep_sp_{identidade(armazenamento)}_v"
+    caminho = os.path.join(diretorio, f"{prefixo}{versao}{extensao}")
+    with _trava:
+        if os.path.exists(caminho):
+            return caminho
+        blocos = armazenamento.ler_em_blocos(TAMANHO_BLOCO, limite=versao)
+        temporario = f"{caminho}.{os.getpid()}.tmp"
+        try:
+            if formato == "Parquet":
+                _escrever_parquet(blocos, temporario)
+            else:
+                _escrever_csv(blocos, temporario, compactar=extensao.endswith(".gz"))
+            os.chmod(temporario, 0o600)
+            os.replace(temporario, caminho)
+        finally:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+        # Versões anteriores do mesmo formato não serão mais pedidas
+        for nome in os.listdir(diretorio):
+            if nome.startswith(prefixo) and nome.endswith(extensao) and nome != os.path.basename(caminho):
+                try:
+                    os.remove(os.path.join(diretorio, nome))
+                except OSError:
+                    pass
+    return caminho
@@ -0,0 +1,207 @@
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import seaborn as sns
+from matplotlib.figure import Figure
+
+# Pontos desenhados no gráfico de dispersão (amostra fixa acima disso)
+AMOSTRA_DISPERSAO = 20000
+# Limite de memória do cache de gráficos, além do número de itens
+MAX_BYTES_CACHE = 64 * 2**20
+
+
+def tamanho_grafico(valor):
+    # Bytes de um PNG, ou estimativa dos arrays de uma figura Plotly
+    if isinstance(valor, (bytes, bytearray)):
+        return len(valor)
+    total = 0
+    for trace in getattr(valor, "data", ()):
+        for eixo in ("x", "y", "z"):
+            dados = getattr(trace, eixo, None)
+            if dados is not None:
+                total += np.asarray(dados).nbytes
+    return total + 4096
+
+
+class CacheGraficos:
+    """Cache LRU de gráficos já renderizados, indexado pela assinatura dos dados.
+
+    Limitado a `capacidade` itens e a `max_bytes` no total; um gráfico maior
+    que `max_bytes` é devolvido sem entrar no cache.
+    """
+
+    def __init__(self, capacidade=64, max_bytes=MAX_BYTES_CACHE):
+        self.capacidade = capacidade
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._itens = OrderedDict()
+        self._trava = threading.Lock()
+
+    def obter(self, chave, gerar):
+        with self._trava:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                return self._itens[chave][0]
+        valor = gerar()
+        tamanho = tamanho_grafico(valor)
+        if tamanho > self.max_bytes:
+            return valor
+        with self._trava:
+            if chave in self._itens:
+                self.bytes -= self._itens.pop(chave)[1]
+            self._itens[chave] = (valor, tamanho)
+            self.bytes += tamanho
+            while len(self._itens) > self.capacidade or self.bytes > self.max_bytes:
+                self.bytes -= self._itens.popitem(last=False)[1][1]
+        return valor
+
+
+_cache = CacheGraficos()
+
+
+def assinatura(*partes):
+    # Hash do conteúdo (valores, índices e nomes) de cada parte do gráfico
+    h = hashlib.sha1()
+    for parte in partes:
+        if isinstance(parte, (pd.Series, pd.DataFrame)):
+            h.update(pd.util.hash_pandas_object(parte, index=True).to_numpy().tobytes())
+            nomes = list(parte.columns) if isinstance(parte, pd.DataFrame) else parte.name
+            h.update(repr((nomes, list(parte.index))).encode())
+        elif isinstance(parte, np.ndarray):
+            h.update(repr((parte.shape, parte.dtype.str)).encode())
+            h.update(np.ascontiguousarray(parte).tobytes())
+        else:
+            h.update(repr(parte).encode())
+    return h.hexdigest()
+
+
+def _png(desenhar, figsize):
+    # Figure sem pyplot: não entra no registro global de figuras e é
+    # descartada assim que os bytes são gerados
+    fig = Figure(figsize=figsize)
+    try:
+        ax = fig.subplots()
+        desenhar(fig, ax)
+        fig.tight_layout()
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png")
+        return buffer.getvalue()
+    finally:
+        fig.clear()
+
+
+def distribuicao(contagem, plotly=False):
+    def estatico():
+        def desenhar(fig, ax):
+            sns.barplot(x=contagem.values, y=contagem.index, ax=ax, palette="viridis")
+            ax.set_xlabel("Número de respostas")
+            ax.set_ylabel("")
+        return _png(desenhar, (10, 6))
+
+    def interativo():
+        import plotly.graph_objects as go
+        fig = go.Figure(go.Bar(x=contagem.values, y=list(contagem.index), orientation="h"))
+        fig.update_layout(xaxis_title="Número de respostas", yaxis={"autorange": "reversed"})
+        return fig
+
+    chave = assinatura("distribuicao", plotly, contagem)
+    return _cache.obter(chave, interativo if plotly else estatico)
+
+
+def barras_agrupadas(tabela, titulo, colormap, plotly=False):
+    def estatico():
+        def desenhar(fig, ax):
+            tabela.plot(kind='bar', ax=ax, colormap=colormap)
+            ax.set_title(titulo)
+            ax.legend(title="Conhecimento", bbox_to_anchor=(1.05, 1), loc='upper left')
+            for rotulo in ax.get_xticklabels():
+                rotulo.set_rotation(45)
+                rotulo.set_ha('right')
+        return _png(desenhar, (10, 6))
+
+    def interativo():
+        import plotly.graph_objects as go
+        fig = go.Figure([
+            go.Bar(name=str(coluna), x=list(tabela.index), y=tabela[coluna].values)
+            for coluna in tabela.columns
+        ])
+        fig.update_layout(barmode="group", title=titulo, legend_title_text="Conhecimento")
+        return fig
+
+    chave = assinatura("barras_agrupadas", plotly, titulo, colormap, tabela)
+    return _cache.obter(chave, interativo if plotly else estatico)
+
+
+def amostra_dispersao(n, amostra=AMOSTRA_DISPERSAO, semente=42):
+    # Linhas desenhadas: todas até `amostra`, senão uma amostra fixa e ordenada
+    if n <= amostra:
+        return slice(None)
+    return np.sort(np.random.default_rng(semente).choice(n, amostra, replace=False))
+
+
+def dispersao_clusters(componentes, clusters, plotly=False, chave=None, amostra=AMOSTRA_DISPERSAO):
+    # Com `chave` (ex.: versão do modelo, versão dos dados e filtro) o gráfico
+    # é encontrado no cache sem percorrer os pontos; sem ela, a assinatura é
+    # calculada sobre a amostra, nunca sobre todas as linhas
+    linhas = amostra_dispersao(len(clusters), amostra)
+    componentes, clusters = componentes[linhas], clusters[linhas]
+
+    def estatico():
+        def desenhar(fig, ax):
+            scatter = ax.scatter(componentes[:, 0], componentes[:, 1], c=clusters, cmap='viridis', alpha=0.7)
+            ax.set_xlabel('Componente Principal 1')
+            ax.set_ylabel('Componente Principal 2')
+            ax.set_title('Agrupamento de Respostas usando Machine Learning (K-Means)')
+            legend = ax.legend(*scatter.legend_elements(), title="Clusters")
+            ax.add_artist(legend)
+        return _png(desenhar, (10, 8))
+
+    def interativo():
+        import plotly.graph_objects as go
+        fig = go.Figure([
+            go.Scattergl(
+                x=componentes[clusters == cluster_id, 0],
+                y=componentes[clusters == cluster_id, 1],
+                mode="markers", name=f"Cluster {cluster_id}", opacity=0.7,
+            )
+            for cluster_id in np.unique(clusters)
+        ])
+        fig.update_layout(
+            title='Agrupamento de Respostas usando Machine Learning (K-Means)',
+            xaxis_title='Componente Principal 1',
+            yaxis_title='Componente Principal 2',
+            legend_title_text="Clusters",
+        )
+        return fig
+
+    if chave is None:
+        chave = assinatura(componentes, clusters)
+    return _cache.obter(("dispersao_clusters", plotly, amostra, chave), interativo if plotly else estatico)
+
+
+def mapa_calor(matriz, titulo, plotly=False):
+    def estatico():
+        def desenhar(fig, ax):
+            sns.heatmap(matriz, annot=True, fmt=".2f", cmap="Reds", vmin=0, vmax=1, ax=ax,
+                        cbar_kws={"label": "V de Cramér"})
+            ax.set_title(titulo)
+            for rotulo in ax.get_xticklabels():
+                rotulo.set_rotation(45)
+                rotulo.set_ha('right')
+        return _png(desenhar, (11, 9))
+
+    def interativo():
+        import plotly.graph_objects as go
+        fig = go.Figure(go.Heatmap(
+            z=matriz.values, x=list(matriz.columns), y=list(matriz.index),
+            colorscale="Reds", zmin=0, zmax=1, colorbar={"title": "V de Cramér"},
+        ))
+        fig.update_layout(title=titulo, yaxis={"autorange": "reversed"})
+        return fig
+
+    chave = assinatura("mapa_calor", plotly, titulo, matriz)
+    return _cache.obter(chave, interativo if plotly else estatico)
@@ -0,0 +1,169 @@
+import threading
+from collections import OrderedDict
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from agregacoes import descrever
+from esquema import COLUNAS_CATEGORICAS, OPCOES, chave_filtros, codigos
+from tendencias import SeriesTemporais
+
+
+class IndiceBitmap:
+    """Um bitmap por opção de cada pergunta, para filtros combinados.
+
+    Cada opção guarda um bit por resposta (np.packbits, 1 bit por linha).
+    Um filtro como Regiao=Zona Leste E Faixa_etaria=18-24 vira um OU entre
+    os bitmaps das opções escolhidas em cada pergunta e um E entre as
+    perguntas, tudo sobre vetores de bytes. O índice também mantém os
+    códigos de cada pergunta, usados para contar apenas as linhas filtradas.
+    """
+
+    def __init__(self, colunas=COLUNAS_CATEGORICAS, capacidade=1024, max_selecoes=32):
+        self.colunas = list(colunas)
+        self.total = 0
+        self.max_selecoes = max_selecoes
+        capacidade = _multiplo_de_8(capacidade)
+        self._codigos = {col: np.full(capacidade, -1, dtype=np.int8) for col in self.colunas}
+        self._bitmaps = {
+            col: np.zeros((len(OPCOES[col]), capacidade // 8), dtype=np.uint8) for col in self.colunas
+        }
+        self._selecoes = OrderedDict()
+        self._trava = threading.Lock()
+
+    def _garantir_capacidade(self, necessaria):
+        capacidade = len(next(iter(self._codigos.values())))
+        if necessaria <= capacidade:
+            return
+        nova = _multiplo_de_8(max(necessaria, 2 * capacidade))
+        for col in self.colunas:
+            codigos_novos = np.full(nova, -1, dtype=np.int8)
+            codigos_novos[:self.total] = self._codigos[col][:self.total]
+            self._codigos[col] = codigos_novos
+            bitmaps_novos = np.zeros((len(OPCOES[col]), nova // 8), dtype=np.uint8)
+            bitmaps_novos[:, :self._bitmaps[col].shape[1]] = self._bitmaps[col]
+            self._bitmaps[col] = bitmaps_novos
+
+    def adicionar(self, bloco):
+        matriz = codigos(bloco, self.colunas)
+        n = len(matriz)
+        with self._trava:
+            inicio = self.total
+            self._garantir_capacidade(inicio + n)
+            primeiro_byte, deslocamento = divmod(inicio, 8)
+            for j, col in enumerate(self.colunas):
+                coluna = matriz[:, j]
+                self._codigos[col][inicio:inicio + n] = coluna
+                bits = coluna[None, :] == np.arange(len(OPCOES[col]), dtype=np.int8)[:, None]
+                if deslocamento:
+                    # Completa o último byte, que já tem bits de linhas anteriores
+                    anteriores = np.unpackbits(
+                        self._bitmaps[col][:, primeiro_byte:primeiro_byte + 1], axis=1
+                    )[:, :deslocamento].astype(bool)
+                    bits = np.concatenate([anteriores, bits], axis=1)
+                empacotados = np.packbits(bits, axis=1)
+                self._bitmaps[col][:, primeiro_byte:primeiro_byte + empacotados.shape[1]] = empacotados
+            self.total += n
+
+    def mascara(self, filtros, total=None):
+        # filtros = {coluna: [opções]}: OU entre as opções, E entre as colunas.
+        # `total` limita a máscara às primeiras linhas (a versão que a página vê)
+        with self._trava:
+            total = self.total if total is None else min(total, self.total)
+            bytes_usados = (total + 7) // 8
+            resultado = None
+            for col, opcoes in filtros.items():
+                if not opcoes:
+                    continue
+                linhas_bitmap = [OPCOES[col].index(opcao) for opcao in opcoes]
+                bitmap = np.bitwise_or.reduce(self._bitmaps[col][linhas_bitmap, :bytes_usados], axis=0)
+                resultado = bitmap if resultado is None else np.bitwise_and(resultado, bitmap)
+        if resultado is None:
+            return np.ones(total, dtype=bool)
+        return np.unpackbits(resultado, count=total).astype(bool)
+
+    def selecao(self, filtros, dados):
+        """Contagens, tabelas e descrição restritas às linhas que passam nos filtros.
+
+        O resultado tem a mesma interface de Agregacoes e fica guardado por
+        combinação de filtros e versão dos dados. Ele não guarda `dados`:
+        apenas os códigos das linhas filtradas e a contagem de
+        Metodos_prevencao, para que as seleções em cache não prendam cópias
+        antigas do conjunto inteiro.
+        """
+        filtros = chave_filtros(filtros)
+        chave = (filtros, len(dados))
+        with self._trava:
+            if chave in self._selecoes:
+                self._selecoes.move_to_end(chave)
+                return self._selecoes[chave]
+        linhas = np.flatnonzero(self.mascara(dict(filtros), len(dados)))
+        metodos = dados["Metodos_prevencao"].iloc[linhas].dropna().value_counts()
+        with self._trava:
+            codigos_linhas = {col: self._codigos[col][linhas] for col in self.colunas}
+            selecao = Selecao(linhas, codigos_linhas, metodos)
+            self._selecoes[chave] = selecao
+            while len(self._selecoes) > self.max_selecoes:
+                self._selecoes.popitem(last=False)
+        return selecao
+
+
+class Selecao:
+    def __init__(self, linhas, codigos_linhas, metodos):
+        self.linhas = linhas
+        self._codigos = codigos_linhas
+        self._memo = {("contagem", "Metodos_prevencao"): metodos.rename("Metodos_prevencao")}
+
+    def __len__(self):
+        return len(self.linhas)
+
+    def contagem(self, coluna):
+        if ("contagem", coluna) not in self._memo:
+            codigos_coluna = self._codigos[coluna]
+            serie = pd.Series(
+                np.bincount(codigos_coluna[codigos_coluna >= 0], minlength=len(OPCOES[coluna])),
+                index=OPCOES[coluna],
+            )
+            self._memo[("contagem", coluna)] = serie.rename(coluna)
+        return self._memo[("contagem", coluna)]
+
+    def tabela(self, linha, coluna):
+        if ("tabela", linha, coluna) not in self._memo:
+            a, b = self._codigos[linha].astype(np.int64), self._codigos[coluna].astype(np.int64)
+            validas = (a >= 0) & (b >= 0)
+            forma = (len(OPCOES[linha]), len(OPCOES[coluna]))
+            valores = np.bincount(a[validas] * forma[1] + b[validas], minlength=forma[0] * forma[1])
+            self._memo[("tabela", linha, coluna)] = pd.DataFrame(
+                valores.reshape(forma),
+                index=pd.Index(OPCOES[linha], name=linha),
+                columns=pd.Index(OPCOES[coluna], name=coluna),
+            )
+        return self._memo[("tabela", linha, coluna)]
+
+    def associacoes(self):
+        if ("associacoes",) not in self._memo:
+            from associacoes import testar_pares
+            tabelas = {
+                (a, b): self.tabela(a, b).to_numpy() for a, b in combinations(self._codigos, 2)
+            }
+            self._memo[("associacoes",)] = testar_pares(tabelas)
+        return self._memo[("associacoes",)]
+
+    def series(self, dados):
+        # Séries temporais das linhas filtradas, agregadas por hora uma única
+        # vez por seleção. `dados` é o mesmo conjunto usado em `selecao` (a
+        # chave do cache inclui a versão) e não fica guardado
+        if ("series",) not in self._memo:
+            self._memo[("series",)] = SeriesTemporais.de_dados(dados.iloc[self.linhas])
+        return self._memo[("series",)]
+
+    def descricao(self):
+        if ("descricao",) not in self._memo:
+            colunas = list(self._codigos) + ["Metodos_prevencao"]
+            self._memo[("descricao",)] = descrever({col: self.contagem(col) for col in colunas})
+        return self._memo[("descricao",)]
+
+
+def _multiplo_de_8(n):
+    return max(8, (n + 7) // 8 * 8)
@@ -0,0 +1,305 @@
+"""Instantâneos da análise: todos os resultados da página em um único arquivo.
+
+Um processo (ou uma tarefa agendada) gera o instantâneo a partir do
+armazenamento; as instâncias do aplicativo em PESQUISA_MODO_ANALISE=instantaneo
+apenas carregam o arquivo mais recente e o exibem, sem recalcular nada.
+
+Uso:
+
+    python instantaneo.py                 # gera uma vez, se estiver desatualizado
+    python instantaneo.py --intervalo 60  # verifica a política a cada 60 s
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import threading
+import time
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from agregacoes import descrever
+from esquema import COLUNAS_CATEGORICAS, OPCOES, codigos
+from tendencias import SeriesTemporais
+
+# Novo instantâneo quando houver pelo menos esta quantidade de respostas novas...
+MIN_NOVAS = 100
+# ...ou quando o atual tiver mais que esta idade (s) e houver alguma resposta nova
+IDADE_MAXIMA = 300
+# Intervalo mínimo (s) entre duas buscas por um arquivo mais novo na página
+VERIFICAR_A_CADA = 5
+# Colunas da tabela horária de SeriesTemporais
+COLUNAS_HORAS = ["total", "conhece_prep", "conhece_pep"]
+
+_NOME = re.compile(r"^instantaneo_v(\d+)\.npz$")
+
+logger = logging.getLogger(__name__)
+
+
+def diretorio_configurado(armazenamento):
+    # Por padrão ao lado do arquivo de respostas, nunca no diretório
+    # temporário, que qualquer usuário da máquina pode escrever
+    padrao = os.path.join(os.path.dirname(os.path.abspath(armazenamento.caminho)), "instantaneos")
+    return os.environ.get("PESQUISA_INSTANTANEOS", padrao)
+
+
+def _versoes(diretorio):
+    # Versões presentes no diretório, da mais nova para a mais antiga
+    try:
+        nomes = os.listdir(diretorio)
+    except FileNotFoundError:
+        return []
+    return sorted((int(m.group(1)) for m in map(_NOME.match, nomes) if m), reverse=True)
+
+
+def _caminho(diretorio, versao):
+    return os.path.join(diretorio, f"instantaneo_v{versao}.npz")
+
+
+class Resumo:
+    """Contagens, tabelas cruzadas e descrição com a mesma interface de Agregacoes."""
+
+    def __init__(self, contagens, tabelas):
+        self._contagens = contagens
+        self._tabelas = tabelas
+        self._memo = {}
+
+    def contagem(self, coluna):
+        return self._contagens[coluna]
+
+    def tabela(self, linha, coluna):
+        if (linha, coluna) in self._tabelas:
+            return self._tabelas[(linha, coluna)]
+        return self._tabelas[(coluna, linha)].T
+
+    def descricao(self):
+        if "descricao" not in self._memo:
+            self._memo["descricao"] = descrever(self._contagens)
+        return self._memo["descricao"]
+
+    def associacoes(self):
+        if "associacoes" not in self._memo:
+            from associacoes import testar_pares
+            self._memo["associacoes"] = testar_pares(
+                {par: tabela.to_numpy() for par, tabela in self._tabelas.items()}
+            )
+        return self._memo["associacoes"]
+
+
+class Instantaneo:
+    """Resultados de uma versão dos dados, com a interface de AnaliseEmBlocos."""
+
+    def __init__(self, versao, gerado_em, agregacoes, series, agrupamento):
+        self.versao = versao
+        self.gerado_em = gerado_em
+        self.agregacoes = agregacoes
+        self.series = series
+        self._agrupamento = agrupamento
+
+    def agrupamento(self):
+        return self._agrupamento
+
+
+def salvar(arrays, diretorio, versao, manter=2):
+    # Somente arrays numéricos e texto (npz), lidos com allow_pickle=False.
+    # Escrita atômica; as versões antigas são apagadas, exceto as `manter`
+    # mais recentes (uma página pode estar lendo a anterior neste momento)
+    os.makedirs(diretorio, mode=0o750, exist_ok=True)
+    caminho = _caminho(diretorio, versao)
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    try:
+        with open(temporario, "wb") as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(temporario, caminho)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+    for antiga in _versoes(diretorio)[manter:]:
+        try:
+            os.remove(_caminho(diretorio, antiga))
+        except OSError:
+            pass
+    return caminho
+
+
+def ler(caminho):
+    from agrupamento import PerfisGrupos, ResultadoAgrupamento
+
+    with np.load(caminho, allow_pickle=False) as arquivo:
+        meta = json.loads(str(arquivo["meta"]))
+        contagens = {
+            col: pd.Series(arquivo[f"contagem__{col}"], index=OPCOES[col], name=col)
+            for col in COLUNAS_CATEGORICAS
+        }
+        contagens["Metodos_prevencao"] = pd.Series(meta["metodos"], name="Metodos_prevencao", dtype=np.int64)
+        tabelas = {
+            (a, b): pd.DataFrame(
+                arquivo[f"tabela__{a}__{b}"],
+                index=pd.Index(OPCOES[a], name=a),
+                columns=pd.Index(OPCOES[b], name=b),
+            )
+            for a, b in combinations(COLUNAS_CATEGORICAS, 2)
+        }
+        horas = None
+        if "horas_valores" in arquivo:
+            indice = pd.MultiIndex.from_arrays(
+                [arquivo["horas_hora"], arquivo["horas_regiao"]], names=["hora", "Regiao"]
+            )
+            horas = pd.DataFrame(arquivo["horas_valores"], index=indice, columns=COLUNAS_HORAS)
+        agrupamento = None
+        if "grupos" in arquivo:
+            perfis = PerfisGrupos(
+                arquivo["tamanhos"],
+                {col: arquivo[f"perfil__{col}"] for col in COLUNAS_CATEGORICAS},
+            )
+            agrupamento = ResultadoAgrupamento(
+                meta["versao"], arquivo["grupos"], arquivo["componentes"], arquivo["conhecimento"], perfis
+            )
+    return Instantaneo(
+        meta["versao"],
+        meta["gerado_em"],
+        Resumo(contagens, tabelas),
+        SeriesTemporais.de_horas(horas, meta["versao"]),
+        agrupamento,
+    )
+
+
+class LeitorInstantaneo:
+    """Mantém em memória o instantâneo mais recente do diretório.
+
+    O diretório só é consultado a cada `verificar_a_cada` segundos, e o
+    arquivo só é lido quando aparece uma versão nova.
+    """
+
+    def __init__(self, diretorio, verificar_a_cada=VERIFICAR_A_CADA):
+        self.diretorio = diretorio
+        self.verificar_a_cada = verificar_a_cada
+        self._atual = None
+        self._verificado_em = 0.0
+        self._trava = threading.Lock()
+
+    def atual(self):
+        with self._trava:
+            agora = time.monotonic()
+            if self._atual is not None and agora - self._verificado_em < self.verificar_a_cada:
+                return self._atual
+            self._verificado_em = agora
+            for versao in _versoes(self.diretorio):
+                if self._atual is not None and versao <= self._atual.versao:
+                    break
+                try:
+                    self._atual = ler(_caminho(self.diretorio, versao))
+                    break
+                except FileNotFoundError:
+                    continue  # apagado entre a listagem e a leitura
+            return self._atual
+
+
+class AtualizadorInstantaneo:
+    """Gera instantâneos seguindo a política de atualização.
+
+    Um novo arquivo é gerado quando chegam `min_novas` respostas desde o
+    último, ou quando ele passa de `idade_maxima` segundos e há ao menos uma
+    resposta nova. Sem respostas novas nada é recalculado.
+    """
+
+    def __init__(self, armazenamento, diretorio=None, min_novas=MIN_NOVAS, idade_maxima=IDADE_MAXIMA):
+        from agregacoes import Agregacoes
+        from agrupamento import PipelineAgrupamento
+        from cache_dados import DadosCompartilhados
+
+        self.diretorio = diretorio or diretorio_configurado(armazenamento)
+        self.min_novas = min_novas
+        self.idade_maxima = idade_maxima
+        self.dados = DadosCompartilhados(armazenamento)
+        self.agregacoes = Agregacoes()
+        self.series = SeriesTemporais()
+        self.dados.inscrever(self.agregacoes.adicionar)
+        self.dados.inscrever(self.series.adicionar)
+        self.pipeline = PipelineAgrupamento()
+        existente = LeitorInstantaneo(self.diretorio).atual()
+        self.versao = existente.versao if existente else 0
+        self.gerado_em = existente.gerado_em if existente else 0.0
+
+    def desatualizado(self, versao):
+        novas = versao - self.versao
+        if novas <= 0:
+            return False
+        return novas >= self.min_novas or time.time() - self.gerado_em >= self.idade_maxima
+
+    def verificar(self):
+        # Retorna o caminho do instantâneo gerado, ou None se o atual ainda vale
+        versao = self.dados.atualizar()
+        if not self.desatualizado(versao):
+            return None
+        return self.gerar()
+
+    def gerar(self):
+        dados = self.dados.dados
+        versao, gerado_em = len(dados), time.time()
+        metodos = self.agregacoes.contagem("Metodos_prevencao")
+        arrays = {
+            "meta": np.array(json.dumps({
+                "versao": versao,
+                "gerado_em": gerado_em,
+                "metodos": {metodo: int(n) for metodo, n in metodos.items()},
+            })),
+        }
+        for col in COLUNAS_CATEGORICAS:
+            arrays[f"contagem__{col}"] = self.agregacoes.contagem(col).to_numpy(np.int64)
+        for a, b in combinations(COLUNAS_CATEGORICAS, 2):
+            arrays[f"tabela__{a}__{b}"] = self.agregacoes.tabela(a, b).to_numpy(np.int64)
+        horas = self.series.horas()
+        if horas is not None:
+            arrays["horas_hora"] = horas.index.get_level_values("hora").to_numpy("datetime64[ns]")
+            arrays["horas_regiao"] = horas.index.get_level_values("Regiao").to_numpy(str)
+            arrays["horas_valores"] = horas[COLUNAS_HORAS].to_numpy(np.int64)
+        if versao >= 3:
+            from agrupamento import perfis_por_grupo
+
+            clusters, componentes, modelo = self.pipeline.resultado(dados, esperar=True)
+            perfis = perfis_por_grupo(
+                clusters, codigos(dados, COLUNAS_CATEGORICAS), COLUNAS_CATEGORICAS, modelo.n_clusters
+            )
+            arrays["grupos"] = clusters.astype(np.int8)
+            arrays["componentes"] = componentes.astype(np.float32)
+            arrays["conhecimento"] = np.asarray(modelo.conhecimento, dtype=np.float64)
+            arrays["tamanhos"] = np.asarray(perfis.tamanhos, dtype=np.int64)
+            for col in COLUNAS_CATEGORICAS:
+                arrays[f"perfil__{col}"] = np.asarray(perfis.distribuicoes[col], dtype=np.int64)
+        caminho = salvar(arrays, self.diretorio, versao)
+        self.versao, self.gerado_em = versao, gerado_em
+        return caminho
+
+    def executar(self, intervalo):
+        while True:
+            try:
+                caminho = self.verificar()
+                if caminho:
+                    logger.info("Instantâneo gerado: %s", caminho)
+            except Exception:
+                logger.exception("Falha ao gerar o instantâneo")
+            time.sleep(intervalo)
+
+
+if __name__ == "__main__":
+    from armazenamento import criar_armazenamento
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--intervalo", type=float, help="repete a verificação a cada N segundos")
+    parser.add_argument("--min-novas", type=int, default=int(os.environ.get("PESQUISA_INSTANTANEO_NOVAS", MIN_NOVAS)))
+    parser.add_argument(
+        "--idade-maxima", type=float, default=float(os.environ.get("PESQUISA_INSTANTANEO_IDADE", IDADE_MAXIMA))
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    atualizador = AtualizadorInstantaneo(
+        criar_armazenamento(), min_novas=args.min_novas, idade_maxima=args.idade_maxima
+    )
+    if args.intervalo:
+        atualizador.executar(args.intervalo)
+    else:
+        print(atualizador.verificar() or "Instantâneo atual ainda é válido")
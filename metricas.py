@@ -0,0 +1,262 @@
+import cProfile
+import glob
+import io
+import logging
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Limites dos intervalos do histograma de latência, em segundos
+LIMITES = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Portas tentadas a partir de PESQUISA_METRICAS_PORTA: cada processo do
+# aplicativo (worker) publica /metrics na primeira que estiver livre
+TENTATIVAS_PORTA = 16
+# O endpoint não tem autenticação: por padrão só atende a própria máquina
+# (um Prometheus local ou via proxy); PESQUISA_METRICAS_ENDERECO amplia
+ENDERECO_PADRAO = "127.0.0.1"
+
+logger = logging.getLogger(__name__)
+
+
+def memoria_residente():
+    # RSS atual em bytes (Linux); em outros sistemas, o pico informado por getrusage
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        if resource is None:
+            return 0
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Histograma:
+    def __init__(self):
+        self.intervalos = [0] * (len(LIMITES) + 1)
+        self.contagem = 0
+        self.soma = 0.0
+        self.maximo = 0.0
+        self.linhas = 0
+        self.memoria = 0
+
+    def registrar(self, duracao, linhas, memoria):
+        i = 0
+        while i < len(LIMITES) and duracao > LIMITES[i]:
+            i += 1
+        self.intervalos[i] += 1
+        self.contagem += 1
+        self.soma += duracao
+        self.maximo = max(self.maximo, duracao)
+        self.linhas += linhas
+        self.memoria += memoria
+
+    def percentil(self, p):
+        # Aproximação pelo limite superior do intervalo que contém o percentil
+        alvo = p * self.contagem
+        acumulado = 0
+        for limite, quantidade in zip(LIMITES + (self.maximo,), self.intervalos):
+            acumulado += quantidade
+            if acumulado >= alvo:
+                return min(limite, self.maximo)
+        return self.maximo
+
+
+class Medicao:
+    def __init__(self, linhas=0):
+        self.linhas = linhas
+
+
+class Metricas:
+    """Tempos, linhas processadas e variação de memória por etapa do aplicativo."""
+
+    def __init__(self):
+        self._etapas = {}
+        self._medidores = {}
+        self._trava = threading.Lock()
+
+    @contextmanager
+    def medir(self, etapa, linhas=0):
+        # O objeto entregue permite informar as linhas depois: `medicao.linhas = n`
+        medicao = Medicao(linhas)
+        memoria_inicial = memoria_residente()
+        inicio = time.perf_counter()
+        try:
+            yield medicao
+        finally:
+            duracao = time.perf_counter() - inicio
+            memoria = memoria_residente() - memoria_inicial
+            with self._trava:
+                self._etapas.setdefault(etapa, Histograma()).registrar(duracao, medicao.linhas, memoria)
+
+    def registrar_medidor(self, nome, funcao, descricao=""):
+        # Valor lido na hora da exportação (ex.: tamanho da fila de gravação)
+        with self._trava:
+            self._medidores[nome] = (funcao, descricao)
+
+    def resumo(self):
+        with self._trava:
+            return [
+                {
+                    "etapa": etapa,
+                    "execucoes": h.contagem,
+                    "media_ms": 1000 * h.soma / h.contagem,
+                    "p50_ms": 1000 * h.percentil(0.5),
+                    "p95_ms": 1000 * h.percentil(0.95),
+                    "max_ms": 1000 * h.maximo,
+                    "linhas": h.linhas,
+                    "memoria_mb": h.memoria / 2**20,
+                }
+                for etapa, h in sorted(self._etapas.items())
+            ]
+
+    def texto_prometheus(self, processo=None):
+        # Com `processo`, cada amostra recebe o rótulo processo="<pid>", para
+        # que os arquivos de vários processos possam ser coletados juntos
+        extra = f',processo="{processo}"' if processo is not None else ""
+        linhas = [
+            "# HELP pesquisa_etapa_duracao_segundos Duração de cada etapa do aplicativo",
+            "# TYPE pesquisa_etapa_duracao_segundos histogram",
+        ]
+        with self._trava:
+            etapas = sorted(self._etapas.items())
+            medidores = sorted(self._medidores.items())
+        for etapa, h in etapas:
+            acumulado = 0
+            for limite, quantidade in zip(LIMITES, h.intervalos):
+                acumulado += quantidade
+                linhas.append(
+                    f'pesquisa_etapa_duracao_segundos_bucket{{etapa="{etapa}",le="{limite}"{extra}}} {acumulado}'
+                )
+            linhas.append(f'pesquisa_etapa_duracao_segundos_bucket{{etapa="{etapa}",le="+Inf"{extra}}} {h.contagem}')
+            linhas.append(f'pesquisa_etapa_duracao_segundos_sum{{etapa="{etapa}"{extra}}} {h.soma}')
+            linhas.append(f'pesquisa_etapa_duracao_segundos_count{{etapa="{etapa}"{extra}}} {h.contagem}')
+        linhas += [
+            "# HELP pesquisa_etapa_linhas_total Linhas processadas por etapa",
+            "# TYPE pesquisa_etapa_linhas_total counter",
+        ]
+        linhas += [f'pesquisa_etapa_linhas_total{{etapa="{etapa}"{extra}}} {h.linhas}' for etapa, h in etapas]
+        linhas += [
+            "# HELP pesquisa_etapa_memoria_bytes Soma da variação de memória residente por etapa",
+            "# TYPE pesquisa_etapa_memoria_bytes gauge",
+        ]
+        linhas += [f'pesquisa_etapa_memoria_bytes{{etapa="{etapa}"{extra}}} {h.memoria}' for etapa, h in etapas]
+        rotulos = f"{{{extra[1:]}}}" if extra else ""
+        for nome, (funcao, descricao) in medidores:
+            linhas += [f"# HELP {nome} {descricao}", f"# TYPE {nome} gauge", f"{nome}{rotulos} {funcao()}"]
+        return "\n".join(linhas) + "\n"
+
+    def exportar_arquivo(self, caminho, processo=None):
+        # Formato "textfile" do node_exporter; a troca atômica evita leituras parciais
+        temporario = f"{caminho}.{os.getpid()}.tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            f.write(self.texto_prometheus(processo))
+        os.replace(temporario, caminho)
+
+    def iniciar_servidor(self, porta, tentativas=TENTATIVAS_PORTA, endereco=ENDERECO_PADRAO):
+        # Endpoint /metrics em uma thread própria, na primeira porta livre entre
+        # `porta` e `porta + tentativas - 1`. Se todas estiverem ocupadas o
+        # aplicativo segue sem o endpoint (retorna None) em vez de falhar
+        metricas = self
+
+        class Manipulador(BaseHTTPRequestHandler):
+            def do_GET(self):
+                corpo = metricas.texto_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def log_message(self, *args):
+                pass
+
+        for candidata in range(porta, porta + tentativas):
+            try:
+                servidor = ThreadingHTTPServer((endereco, candidata), Manipulador)
+            except OSError:
+                continue
+            threading.Thread(target=servidor.serve_forever, name="metricas-http", daemon=True).start()
+            logger.info("Métricas em http://%s:%d/metrics (processo %d)", endereco, candidata, os.getpid())
+            return servidor
+        logger.warning(
+            "Portas %d a %d ocupadas; métricas deste processo não serão publicadas via HTTP",
+            porta, porta + tentativas - 1,
+        )
+        return None
+
+
+registro = Metricas()
+
+
+_arquivos_limpos = set()
+
+
+def caminho_do_processo(caminho, pid=None):
+    # metricas.prom -> metricas.<pid>.prom: um arquivo por processo, para que
+    # os workers não sobrescrevam as métricas uns dos outros
+    base, extensao = os.path.splitext(caminho)
+    return f"{base}.{os.getpid() if pid is None else pid}{extensao}"
+
+
+def _remover_de_processos_encerrados(caminho):
+    # Apaga os arquivos deixados por processos que já terminaram
+    base, extensao = os.path.splitext(caminho)
+    for arquivo in glob.glob(f"{glob.escape(base)}.*{glob.escape(extensao)}"):
+        pid = arquivo[len(base) + 1:len(arquivo) - len(extensao)]
+        if not pid.isdigit() or int(pid) == os.getpid():
+            continue
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            try:
+                os.remove(arquivo)
+            except OSError:
+                pass
+        except OSError:
+            pass  # processo existe, mas de outro usuário
+
+
+def exportar_arquivo_configurado(metricas=registro):
+    # Atualiza o arquivo deste processo a partir de PESQUISA_METRICAS_ARQUIVO, se houver
+    caminho = os.environ.get("PESQUISA_METRICAS_ARQUIVO")
+    if not caminho:
+        return
+    if caminho not in _arquivos_limpos:
+        _arquivos_limpos.add(caminho)
+        _remover_de_processos_encerrados(caminho)
+    metricas.exportar_arquivo(caminho_do_processo(caminho), processo=os.getpid())
+
+
+class Perfil:
+    """Captura de perfil de uma execução da página (pyinstrument, se instalado, ou cProfile)."""
+
+    def __init__(self):
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            self._pyinstrument = None
+            self._perfil = cProfile.Profile()
+        else:
+            self._pyinstrument = Profiler()
+
+    def iniciar(self):
+        if self._pyinstrument:
+            self._pyinstrument.start()
+        else:
+            self._perfil.enable()
+
+    def parar(self):
+        if self._pyinstrument:
+            self._pyinstrument.stop()
+            return self._pyinstrument.output_text(unicode=True)
+        self._perfil.disable()
+        saida = io.StringIO()
+        pstats.Stats(self._perfil, stream=saida).sort_stats("cumulative").print_stats(40)
+        return saida.getvalue()
@@ -0,0 +1,397 @@
+import streamlit as st
+import os
+from estilo import configurar_pagina, rodape
+from esquema import COLUNAS, COLUNAS_CATEGORICAS, OPCOES, chave_filtros
+from recursos import (
+    obter_armazenamento, obter_dados_compartilhados, obter_agregacoes, obter_pipeline_agrupamento,
+    obter_metricas, obter_indice, obter_series_temporais, obter_analise_em_blocos, modo_analise,
+    obter_leitor_instantaneo, obter_guarda_envios
+)
+from metricas import Perfil, exportar_arquivo_configurado
+import graficos
+import exportacao
+from tendencias import FREQUENCIAS
+from agrupamento import descrever_grupos
+from associacoes import ALFA, CORRECOES, matriz_associacoes
+from protecao import DUPLICADA, EXCESSO
+
+# Configuração da página
+configurar_pagina("Análise - Pesquisa PrEP/HIV - São Paulo")
+
+# Captura de perfil pedida no painel de administração vale para uma execução
+perfil = None
+if st.session_state.pop('capturar_perfil', False):
+    perfil = Perfil()
+    perfil.iniciar()
+
+metricas = obter_metricas()
+armazenamento = obter_armazenamento()
+modo = modo_analise()
+# Nos modos "blocos" e "instantaneo" os resultados vêm prontos de `analise`
+# e as respostas não ficam em memória
+pre_calculado = modo in ("blocos", "instantaneo")
+if modo == "blocos":
+    # Modo em blocos: as respostas são lidas aos poucos do armazenamento
+    analise = obter_analise_em_blocos()
+    versao_anterior = analise.versao
+    with metricas.medir("carregamento") as medicao:
+        total_respostas = analise.atualizar()
+        medicao.linhas = total_respostas - versao_anterior
+    agregacoes = analise.agregacoes
+    dados = None
+elif modo == "instantaneo":
+    # Modo instantâneo: só carrega o arquivo gerado por instantaneo.py
+    with metricas.medir("carregamento"):
+        analise = obter_leitor_instantaneo().atual()
+    total_respostas = analise.versao if analise is not None else 0
+    agregacoes = analise.agregacoes if analise is not None else None
+    dados = None
+else:
+    dados_compartilhados = obter_dados_compartilhados()
+    agregacoes = obter_agregacoes()
+    versao_anterior = dados_compartilhados.versao
+    with metricas.medir("carregamento") as medicao:
+        medicao.linhas = dados_compartilhados.atualizar() - versao_anterior
+    dados = dados_compartilhados.dados
+    total_respostas = len(dados)
+
+# Seção de visualizações (apenas se houver dados)
+if total_respostas:
+    st.markdown('<h1 class="main-header">Análise dos Dados Coletados</h1>', unsafe_allow_html=True)
+    
+    # Estatísticas rápidas
+    st.markdown(f"""
+    <div style="background-color: #E6F7FF; padding: 1rem; border-radius: 0.5rem; margin-bottom: 1.5rem; color: #000000;">
+        <h3 style="text-align: center; color: #000000;">📊 Total de Respostas: {total_respostas}</h3>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    # Filtros para os gráficos
+    st.sidebar.header("Filtros para Análise")
+    
+    # Seleção de variáveis para análise
+    variavel_x = st.sidebar.selectbox(
+        "Variável para análise (eixo X):",
+        options=[col for col in COLUNAS if col != 'timestamp'],
+        index=0
+    )
+    
+    # Gráficos interativos são desenhados no navegador, sem custo de CPU no servidor
+    usar_plotly = st.sidebar.checkbox("Gráficos interativos (Plotly)", value=False)
+    
+    # Filtros combinados: valem para todos os gráficos, tabelas e grupos
+    if pre_calculado:
+        st.sidebar.caption("Os filtros de respostas não estão disponíveis neste modo de análise.")
+        filtros = {}
+    else:
+        with st.sidebar.expander("Filtrar respostas"):
+            filtros = {col: st.multiselect(col, OPCOES[col]) for col in COLUNAS_CATEGORICAS}
+    
+    if any(filtros.values()):
+        with metricas.medir("filtros", linhas=len(dados)):
+            fonte = obter_indice().selecao(filtros, dados)
+        linhas_filtradas = fonte.linhas
+        st.markdown(f"**Respostas que atendem aos filtros:** {len(fonte)}")
+    else:
+        fonte = agregacoes
+        linhas_filtradas = None
+    
+    def exibir_grafico(grafico):
+        with metricas.medir("graficos"):
+            _exibir_grafico(grafico)
+    
+    def _exibir_grafico(grafico):
+        if usar_plotly:
+            st.plotly_chart(grafico, use_container_width=True)
+        else:
+            st.image(grafico, use_column_width=True)
+    
+    # Gráfico de barras da variável selecionada
+    try:
+        st.subheader(f"Distribuição de {variavel_x}")
+        # Categorias fixas mantêm a ordem do eixo igual à do formulário
+        with metricas.medir("agregacoes"):
+            contagem = fonte.contagem(variavel_x)
+        
+        exibir_grafico(graficos.distribuicao(contagem, plotly=usar_plotly))
+    except Exception as e:
+        st.error(f"Erro ao criar gráfico: {str(e)}")
+    
+    # Gráficos de comparação
+    st.subheader("Relação entre Conhecimento e Demografia")
+    
+    col7, col8 = st.columns(2)
+    
+    with col7:
+        try:
+            # Conhecimento de PrEP por gênero
+            with metricas.medir("agregacoes"):
+                conhecimento_genero = fonte.tabela('Genero', 'Conhecimento_PrEP')
+            exibir_grafico(graficos.barras_agrupadas(
+                conhecimento_genero, "Conhecimento de PrEP por Identidade de Gênero", 'Set3', plotly=usar_plotly
+            ))
+        except Exception as e:
+            st.error(f"Erro ao criar gráfico de gênero: {str(e)}")
+    
+    with col8:
+        try:
+            # Conhecimento de PrEP por faixa etária
+            with metricas.medir("agregacoes"):
+                conhecimento_idade = fonte.tabela('Faixa_etaria', 'Conhecimento_PrEP')
+            exibir_grafico(graficos.barras_agrupadas(
+                conhecimento_idade, "Conhecimento de PrEP por Faixa Etária", 'Set2', plotly=usar_plotly
+            ))
+        except Exception as e:
+            st.error(f"Erro ao criar gráfico de idade: {str(e)}")
+    
+    # Associação entre todos os pares de perguntas (qui-quadrado e V de Cramér)
+    try:
+        st.subheader("Associação entre as Perguntas")
+        with metricas.medir("associacoes"):
+            associacoes = fonte.associacoes()
+        
+        col_a1, col_a2, col_a3 = st.columns(3)
+        with col_a1:
+            correcao = st.selectbox("Correção para múltiplos testes:", list(CORRECOES))
+        with col_a2:
+            ordenar_mapa = st.selectbox("Ordem das perguntas:", ["Formulário", "Força da associação"])
+        with col_a3:
+            so_significativas = st.checkbox(f"Só associações significativas (p < {ALFA})")
+        coluna_p = CORRECOES[correcao]
+        
+        matriz = matriz_associacoes(
+            associacoes, COLUNAS_CATEGORICAS,
+            coluna_p=coluna_p if so_significativas else None,
+            ordenar=ordenar_mapa == "Força da associação"
+        )
+        exibir_grafico(graficos.mapa_calor(matriz, "V de Cramér entre as perguntas", plotly=usar_plotly))
+        
+        # Tabela ordenável: clique no cabeçalho de uma coluna para ordenar
+        st.dataframe(
+            associacoes[["pergunta_a", "pergunta_b", "v_cramer", "qui2", "gl", coluna_p, "n"]]
+            .assign(significativa=associacoes[coluna_p] < ALFA),
+            use_container_width=True
+        )
+        st.caption(
+            "V de Cramér vai de 0 (sem associação) a 1 (associação completa). "
+            f"Os p-valores estão corrigidos por {correcao} para os {len(associacoes)} pares testados."
+        )
+    except Exception as e:
+        st.error(f"Erro ao calcular as associações: {str(e)}")
+    
+    # Evolução no tempo (a partir das contagens por hora já agregadas)
+    try:
+        st.subheader("Evolução das Respostas no Tempo")
+        with metricas.medir("tendencias"):
+            if pre_calculado:
+                series = analise.series
+            elif linhas_filtradas is not None:
+                series = fonte.series(dados)
+            else:
+                series = obter_series_temporais()
+        
+        col_t1, col_t2, col_t3 = st.columns(3)
+        with col_t1:
+            periodo = st.selectbox("Agrupar por:", list(FREQUENCIAS), index=1)
+        with col_t2:
+            metodo = st.selectbox("Conhecimento de:", ["PrEP", "PEP"])
+        with col_t3:
+            janela = st.number_input("Janela móvel (períodos):", min_value=1, max_value=90, value=1)
+        
+        st.write("**Respostas por período**")
+        st.line_chart(series.respostas(FREQUENCIAS[periodo]))
+        
+        st.write(f"**Proporção que conhece a {metodo}, por região**")
+        coluna_conhecimento = "conhece_prep" if metodo == "PrEP" else "conhece_pep"
+        st.line_chart(series.participacao(FREQUENCIAS[periodo], coluna_conhecimento, int(janela)))
+    except Exception as e:
+        st.error(f"Erro ao criar gráficos de evolução: {str(e)}")
+    
+    # Análise de Machine Learning (Agrupamento) - SOMENTE SE HOUVER DADOS SUFICIENTES
+    if total_respostas >= 3:  # Pelo menos 3 respostas para 3 clusters
+        st.markdown("---")
+        st.markdown('<h2 class="section-header">Análise com Inteligência Artificial</h2>', unsafe_allow_html=True)
+        
+        st.markdown("""
+        <div style="background-color: #FFF0F5; padding: 1.5rem; border-radius: 0.5rem; border: 2px solid #FF69B4; margin: 1rem 0; color: #000000;">
+            <h4 style="color: #000000;">🤖 Como a Inteligência Artificial está analisando estas respostas</h4>
+            <p style="color: #000000;">Usamos um algoritmo de <strong>aprendizado não supervisionado</strong> chamado K-Means para agrupar 
+            automaticamente os respondentes com base em padrões similares em suas respostas.</p>
+            
+            <h5 style="color: #000000;">O processo:</h5>
+            <ol style="color: #000000;">
+                <li>Convertemos todas as respostas em valores numéricos</li>
+                <li>Normalizamos os dados para que todas as variáveis tenham o mesmo peso</li>
+                <li>Reduzimos a dimensionalidade para visualização em 2D (PCA)</li>
+                <li>Agrupamos os respondentes em clusters com características similares</li>
+            </ol>
+        </div>
+        """, unsafe_allow_html=True)
+        
+        automatico = not pre_calculado and st.checkbox(
+            "Escolher o número de grupos automaticamente",
+            help="Testa de 2 a 8 grupos com várias inicializações e usa o de maior coeficiente de silhueta."
+        )
+        
+        try:
+            # Modelo em cache: só é reajustado quando chegam respostas novas suficientes
+            with metricas.medir("agrupamento", linhas=total_respostas):
+                if pre_calculado:
+                    resultado = analise.agrupamento()
+                else:
+                    resultado = obter_pipeline_agrupamento(automatico).resultado(dados)
+            
+            if resultado is not None and pre_calculado:
+                modelo = resultado
+                clusters, componentes = modelo.clusters, modelo.componentes
+                n_clusters = modelo.n_clusters
+            elif resultado is not None:
+                clusters, componentes, modelo = resultado
+                n_clusters = modelo.n_clusters
+                if linhas_filtradas is not None:
+                    clusters, componentes = clusters[linhas_filtradas], componentes[linhas_filtradas]
+            
+            if resultado is not None and len(clusters) == 0:
+                st.info("Nenhuma resposta atende aos filtros selecionados.")
+            elif resultado is not None:
+                # Visualizar clusters: no máximo AMOSTRA_DISPERSAO pontos, com o gráfico
+                # guardado por modelo, versão dos dados e filtro (sem varrer os pontos a cada recarga)
+                if pre_calculado:
+                    chave_grafico = (modo, modelo.versao, n_clusters)
+                else:
+                    chave_grafico = (modo, automatico, modelo.versao, n_clusters, len(dados), chave_filtros(filtros))
+                exibir_grafico(graficos.dispersao_clusters(
+                    componentes, clusters, plotly=usar_plotly, chave=chave_grafico
+                ))
+                pontos = min(len(clusters), graficos.AMOSTRA_DISPERSAO)
+                if pontos < (len(clusters) if linhas_filtradas is not None else total_respostas):
+                    st.caption(f"Gráfico com uma amostra aleatória de {pontos} respostas.")
+                
+                # Interpretação dos clusters: grupos numerados do menor para o maior conhecimento médio
+                st.info(
+                    "**Interpretação dos Clusters:** Esta análise agrupa os respondentes com base em padrões similares em suas respostas.\n"
+                    + "\n".join(
+                        f"- **Cluster {cluster_id}**: pessoas com {descricao}"
+                        for cluster_id, descricao in enumerate(descrever_grupos(modelo.conhecimento))
+                    )
+                )
+                
+                if modelo.avaliacao is not None:
+                    with st.expander(f"📐 Escolha do número de grupos ({n_clusters} grupos)"):
+                        st.write("Média entre as inicializações para cada número de grupos:")
+                        st.dataframe(modelo.avaliacao.groupby("k")[["silhueta", "inercia"]].mean())
+                
+                # Estatísticas por cluster
+                st.subheader("Características dos Grupos Identificados")
+                
+                # Distribuições de todas as perguntas em todos os grupos, contadas sobre os
+                # códigos das respostas e guardadas pelo pipeline por versão do modelo e
+                # filtro (nos modos em blocos e instantâneo já vêm prontas)
+                with metricas.medir("perfis_grupos", linhas=len(clusters)):
+                    if pre_calculado:
+                        perfis = modelo.perfis
+                    else:
+                        perfis = obter_pipeline_agrupamento(automatico).perfis(
+                            dados, clusters, modelo, linhas_filtradas, filtros
+                        )
+                
+                outra_pergunta = st.selectbox(
+                    "Outra pergunta para comparar os grupos:",
+                    [col for col in COLUNAS_CATEGORICAS if col not in ('Conhecimento_PrEP', 'Faixa_etaria')]
+                )
+                
+                # Mostrar características de cada cluster
+                for cluster_id in range(n_clusters):
+                    with st.expander(f"📋 Características do Grupo {cluster_id}"):
+                        st.write(f"**Tamanho do grupo:** {perfis.tamanhos[cluster_id]} respondentes")
+                        
+                        # Mostrar distribuição de algumas variáveis importantes
+                        col9, col10, col11 = st.columns(3)
+                        
+                        with col9:
+                            st.write("**Conhecimento de PrEP:**")
+                            st.write(perfis.distribuicao(cluster_id, 'Conhecimento_PrEP'))
+                        
+                        with col10:
+                            st.write("**Faixa Etária:**")
+                            st.write(perfis.distribuicao(cluster_id, 'Faixa_etaria'))
+                        
+                        with col11:
+                            st.write(f"**{outra_pergunta}:**")
+                            st.write(perfis.distribuicao(cluster_id, outra_pergunta))
+            else:
+                st.info("⏳ O modelo de agrupamento está sendo treinado. Atualize a página em instantes para ver os grupos.")
+        except Exception as e:
+            st.error(f"Erro na análise de machine learning: {str(e)}")
+    else:
+        st.info("🧠 A análise com Inteligência Artificial será exibida quando houver pelo menos 3 respostas.")
+    
+    # Estatísticas descritivas
+    try:
+        st.markdown("---")
+        st.subheader("Estatísticas Descritivas")
+        with metricas.medir("descricao"):
+            descricao = fonte.descricao()
+        st.dataframe(descricao)
+    except Exception as e:
+        st.error(f"Erro ao exibir estatísticas: {str(e)}")
+    
+    # Download dos dados
+    try:
+        st.subheader("Exportar Dados")
+        formato = st.selectbox("Formato do arquivo:", exportacao.formatos_disponiveis())
+        extensao, mime = exportacao.FORMATOS[formato]
+        
+        # O arquivo só é gerado quando alguém pede, e fica em cache por versão dos dados
+        if st.button("Preparar arquivo para download"):
+            with metricas.medir("exportacao", linhas=total_respostas):
+                st.session_state.exportacao = (formato, exportacao.exportar(
+                    armazenamento, formato, total_respostas
+                ))
+        
+        preparado = st.session_state.get('exportacao')
+        if preparado and preparado[0] == formato and os.path.exists(preparado[1]):
+            with open(preparado[1], "rb") as arquivo:
+                st.download_button(
+                    label=f"Baixar dados completos ({formato})",
+                    data=arquivo,
+                    file_name=f"dados_prep_sp{extensao}",
+                    mime=mime
+                )
+    except Exception as e:
+        st.error(f"Erro ao preparar download: {str(e)}")
+
+else:
+    st.info("📝 Não há dados coletados ainda. As visualizações serão exibidas aqui quando houver respostas suficientes.")
+
+if perfil is not None:
+    st.session_state.relatorio_perfil = perfil.parar()
+
+# Painel de administração: só aparece com PESQUISA_ADMIN_SENHA configurada
+senha_admin = os.environ.get("PESQUISA_ADMIN_SENHA")
+if senha_admin:
+    with st.sidebar.expander("🔧 Administração"):
+        if st.text_input("Senha", type="password") == senha_admin:
+            st.write("**Tempo por etapa (desde o início do processo)**")
+            st.dataframe(metricas.resumo())
+            guarda = obter_guarda_envios()
+            st.write(
+                f"**Envios:** {guarda.aceitas} aceitos, {guarda.rejeitadas[DUPLICADA]} duplicados "
+                f"e {guarda.rejeitadas[EXCESSO]} acima do limite por sessão"
+            )
+            st.download_button(
+                label="Baixar métricas (Prometheus)",
+                data=metricas.texto_prometheus(),
+                file_name="metricas.prom",
+                mime="text/plain"
+            )
+            if st.button("Capturar perfil da próxima execução"):
+                st.session_state.capturar_perfil = True
+                st.info("A próxima interação com a página será perfilada.")
+            if 'relatorio_perfil' in st.session_state:
+                st.text(st.session_state.relatorio_perfil)
+
+exportar_arquivo_configurado(metricas)
+
+# Rodapé
+rodape()
@@ -0,0 +1,86 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+# Motivos de rejeição de um envio
+DUPLICADA = "duplicada"
+EXCESSO = "excesso"
+
+
+def impressao_digital(sessao, resposta):
+    # Hash da sessão e do conteúdo da resposta; o timestamp não entra, para
+    # que um clique duplo gere a mesma impressão digital
+    conteudo = repr((sessao, sorted((k, v) for k, v in resposta.items() if k != "timestamp")))
+    return hashlib.blake2b(conteudo.encode("utf-8"), digest_size=16).digest()
+
+
+class GuardaEnvios:
+    """Filtra envios repetidos e em excesso antes de chegarem ao armazenamento.
+
+    - Duplicatas: a impressão digital de cada envio aceito fica guardada por
+      `validade` segundos, na ordem de chegada; as vencidas saem do início e,
+      acima de `capacidade`, as mais antigas são descartadas.
+    - Excesso: cada sessão tem um balde com `limite` envios, reposto à taxa
+      de `limite` por `janela` segundos. Sessões inativas por uma janela inteira
+      (com o balde já cheio de novo) também saem do início.
+
+    Cada verificação custa O(1) amortizado, independente do total de respostas.
+    """
+
+    def __init__(self, validade=600, limite=5, janela=60, capacidade=100000):
+        self.validade = validade
+        self.limite = limite
+        self.janela = janela
+        self.capacidade = capacidade
+        self.aceitas = 0
+        self.rejeitadas = {DUPLICADA: 0, EXCESSO: 0}
+        self._digitais = OrderedDict()
+        self._baldes = OrderedDict()
+        self._trava = threading.Lock()
+
+    def verificar(self, sessao, resposta, agora=None):
+        # Retorna None se o envio pode ser gravado, ou o motivo da rejeição
+        agora = time.monotonic() if agora is None else agora
+        digital = impressao_digital(sessao, resposta)
+        with self._trava:
+            self._expirar(agora)
+            if digital in self._digitais:
+                self.rejeitadas[DUPLICADA] += 1
+                return DUPLICADA
+            if not self._consumir(sessao, agora):
+                self.rejeitadas[EXCESSO] += 1
+                return EXCESSO
+            self._digitais[digital] = agora
+            if len(self._digitais) > self.capacidade:
+                self._digitais.popitem(last=False)
+            self.aceitas += 1
+            return None
+
+    def desfazer(self, sessao, resposta):
+        # Desfaz um envio aceito que não chegou a ser gravado (ex.: fila cheia),
+        # para que a nova tentativa não seja tratada como duplicata
+        digital = impressao_digital(sessao, resposta)
+        with self._trava:
+            if self._digitais.pop(digital, None) is None:
+                return
+            self.aceitas -= 1
+            if sessao in self._baldes:
+                fichas, instante = self._baldes[sessao]
+                self._baldes[sessao] = (min(self.limite, fichas + 1), instante)
+
+    def _expirar(self, agora):
+        while self._digitais and next(iter(self._digitais.values())) <= agora - self.validade:
+            self._digitais.popitem(last=False)
+        while self._baldes and next(iter(self._baldes.values()))[1] <= agora - self.janela:
+            self._baldes.popitem(last=False)
+
+    def _consumir(self, sessao, agora):
+        fichas, instante = self._baldes.pop(sessao, (self.limite, agora))
+        fichas = min(self.limite, fichas + (agora - instante) * self.limite / self.janela)
+        aceito = fichas >= 1
+        # Reinserida no fim: os baldes ficam ordenados pelo último envio
+        self._baldes[sessao] = (fichas - 1 if aceito else fichas, agora)
+        if len(self._baldes) > self.capacidade:
+            self._baldes.popitem(last=False)
+        return aceito
@@ -0,0 +1,158 @@
+import streamlit as st
+
+# Objetos compartilhados por todas as sessões e páginas do processo.
+# As bibliotecas pesadas (scikit-learn, scipy) só são importadas quando a
+# página de análise pede o recurso correspondente.
+
+
+# Métricas do processo; PESQUISA_METRICAS_PORTA publica /metrics via HTTP
+# (cada worker na primeira porta livre a partir dela)
+@st.cache_resource
+def obter_metricas():
+    import os
+    from metricas import ENDERECO_PADRAO, registro
+    porta = os.environ.get("PESQUISA_METRICAS_PORTA")
+    if porta:
+        registro.iniciar_servidor(
+            int(porta), endereco=os.environ.get("PESQUISA_METRICAS_ENDERECO", ENDERECO_PADRAO)
+        )
+    return registro
+
+
+# Armazenamento compartilhado entre todas as sessões
+@st.cache_resource
+def obter_armazenamento():
+    from armazenamento import criar_armazenamento
+    return criar_armazenamento()
+
+
+# Fila de gravação em lote: o envio do formulário não espera pelo disco
+@st.cache_resource
+def obter_escritor():
+    import os
+    from armazenamento import EscritorEmLote
+    escritor = EscritorEmLote(
+        obter_armazenamento(),
+        tamanho_lote=int(os.environ.get("PESQUISA_LOTE_TAMANHO", 100)),
+        intervalo=float(os.environ.get("PESQUISA_LOTE_INTERVALO", 0.2)),
+        arquivo_falhas=os.environ.get("PESQUISA_LOTE_FALHAS"),
+    )
+    metricas = obter_metricas()
+    metricas.registrar_medidor(
+        "pesquisa_fila_gravacao_pendentes", lambda: escritor.pendentes, "Respostas aguardando gravação"
+    )
+    metricas.registrar_medidor(
+        "pesquisa_respostas_gravadas", lambda: escritor.gravadas, "Respostas gravadas pelo escritor em lote"
+    )
+    metricas.registrar_medidor(
+        "pesquisa_lotes_gravados", lambda: escritor.lotes, "Lotes gravados pelo escritor em lote"
+    )
+    metricas.registrar_medidor(
+        "pesquisa_gravacao_tentativas_falhas", lambda: escritor.tentativas_falhas,
+        "Tentativas de gravar um lote que terminaram em erro"
+    )
+    metricas.registrar_medidor(
+        "pesquisa_lotes_com_falha", lambda: escritor.lotes_com_falha,
+        "Lotes que esgotaram as tentativas de gravação"
+    )
+    metricas.registrar_medidor(
+        "pesquisa_respostas_desviadas", lambda: escritor.desviadas,
+        "Respostas guardadas no arquivo de falhas em vez do armazenamento"
+    )
+    return escritor
+
+
+# Proteção contra envios duplicados e em excesso, antes da fila de gravação
+@st.cache_resource
+def obter_guarda_envios():
+    import os
+    from protecao import DUPLICADA, EXCESSO, GuardaEnvios
+    guarda = GuardaEnvios(
+        validade=float(os.environ.get("PESQUISA_DUPLICATA_VALIDADE", 600)),
+        limite=int(os.environ.get("PESQUISA_ENVIOS_LIMITE", 5)),
+        janela=float(os.environ.get("PESQUISA_ENVIOS_JANELA", 60)),
+    )
+    metricas = obter_metricas()
+    metricas.registrar_medidor(
+        "pesquisa_envios_aceitos", lambda: guarda.aceitas, "Envios aceitos pela proteção de envios"
+    )
+    metricas.registrar_medidor(
+        "pesquisa_envios_rejeitados_duplicados", lambda: guarda.rejeitadas[DUPLICADA],
+        "Envios repetidos da mesma sessão descartados"
+    )
+    metricas.registrar_medidor(
+        "pesquisa_envios_rejeitados_excesso", lambda: guarda.rejeitadas[EXCESSO],
+        "Envios rejeitados por excederem o limite por sessão"
+    )
+    return guarda
+
+
+# Conjunto de dados único por processo, atualizado de forma incremental.
+# PESQUISA_OBSERVAR_INTERVALO (s) define a frequência com que as gravações
+# de outros processos são incorporadas; 0 desliga a verificação periódica
+@st.cache_resource
+def obter_dados_compartilhados():
+    import os
+    from cache_dados import DadosCompartilhados
+    dados = DadosCompartilhados(obter_armazenamento())
+    intervalo = float(os.environ.get("PESQUISA_OBSERVAR_INTERVALO", 2))
+    if intervalo > 0:
+        dados.observar(intervalo)
+    return dados
+
+
+# Contagens e tabelas cruzadas mantidas a cada nova resposta
+@st.cache_resource
+def obter_agregacoes():
+    from agregacoes import Agregacoes
+    agregacoes = Agregacoes()
+    obter_dados_compartilhados().inscrever(agregacoes.adicionar)
+    return agregacoes
+
+
+# Bitmaps por opção para os filtros combinados da página de análise
+@st.cache_resource
+def obter_indice():
+    from indices import IndiceBitmap
+    indice = IndiceBitmap()
+    obter_dados_compartilhados().inscrever(indice.adicionar)
+    return indice
+
+
+# Séries por hora e região, atualizadas a cada resposta nova
+@st.cache_resource
+def obter_series_temporais():
+    from tendencias import SeriesTemporais
+    series = SeriesTemporais()
+    obter_dados_compartilhados().inscrever(series.adicionar)
+    return series
+
+
+# Modelo de agrupamento ajustado uma vez e reaproveitado por todas as sessões
+# (um modelo com 3 grupos fixos e outro com escolha automática do número de grupos)
+@st.cache_resource
+def obter_pipeline_agrupamento(automatico=False):
+    from agrupamento import PipelineAgrupamento
+    return PipelineAgrupamento(n_clusters="auto" if automatico else 3)
+
+
+# Modo de análise: "memoria" (padrão) mantém as respostas em um DataFrame
+# compartilhado; "blocos" percorre o armazenamento sem carregá-lo inteiro;
+# "instantaneo" só exibe o último arquivo gerado por instantaneo.py
+def modo_analise():
+    import os
+    return os.environ.get("PESQUISA_MODO_ANALISE", "memoria").lower()
+
+
+# Agregações, séries e agrupamento do modo em blocos
+@st.cache_resource
+def obter_analise_em_blocos():
+    from analise_em_blocos import AnaliseEmBlocos
+    return AnaliseEmBlocos(obter_armazenamento())
+
+
+# Último instantâneo da análise, relido só quando aparece uma versão nova
+@st.cache_resource
+def obter_leitor_instantaneo():
+    from instantaneo import LeitorInstantaneo, diretorio_configurado
+    return LeitorInstantaneo(diretorio_configurado(obter_armazenamento()))
@@ -0,0 +1,98 @@
+import threading
+
+import pandas as pd
+
+from esquema import NIVEIS_CONHECIMENTO
+
+# Quem respondeu "Sim, conheço bem" ou "Conheço parcialmente"
+CONHECE = NIVEIS_CONHECIMENTO[:2]
+
+# Granularidades oferecidas na página (apelido de frequência do pandas)
+FREQUENCIAS = {"Hora": "h", "Dia": "D", "Semana": "W"}
+
+
+def agregar_por_hora(bloco):
+    # Respostas e quantos conhecem PrEP/PEP, por hora e região
+    tabela = pd.DataFrame({
+        "hora": pd.to_datetime(bloco["timestamp"]).dt.floor("h"),
+        "Regiao": bloco["Regiao"].astype(str),
+        "total": 1,
+        "conhece_prep": bloco["Conhecimento_PrEP"].isin(CONHECE).astype(int),
+        "conhece_pep": bloco["Conhecimento_PEP"].isin(CONHECE).astype(int),
+    })
+    return tabela.groupby(["hora", "Regiao"]).sum()
+
+
+class SeriesTemporais:
+    """Contagens por hora e região, atualizadas a cada bloco de respostas novas.
+
+    Só os timestamps do bloco novo são convertidos; as séries por dia ou
+    semana são obtidas reagrupando esses blocos horários, que têm índice
+    datetime64.
+    """
+
+    def __init__(self):
+        self.versao = 0
+        self._horas = None
+        self._memo = {}
+        self._trava = threading.Lock()
+
+    @classmethod
+    def de_dados(cls, dados):
+        series = cls()
+        if len(dados):
+            series.adicionar(dados)
+        return series
+
+    @classmethod
+    def de_horas(cls, horas, versao):
+        # Reconstrói as séries a partir de uma tabela horária já agregada
+        series = cls()
+        series._horas = horas
+        series.versao = versao
+        return series
+
+    def horas(self):
+        # Tabela (hora, Regiao) -> contagens, base de todas as séries
+        with self._trava:
+            return self._horas
+
+    def adicionar(self, bloco):
+        novo = agregar_por_hora(bloco)
+        with self._trava:
+            self._horas = novo if self._horas is None else self._horas.add(novo, fill_value=0)
+            self.versao += len(bloco)
+            self._memo.clear()
+
+    def _memorizado(self, chave, calcular):
+        with self._trava:
+            if chave not in self._memo:
+                self._memo[chave] = calcular(self._horas)
+            return self._memo[chave]
+
+    def respostas(self, frequencia="D"):
+        # Número de respostas por período
+        def calcular(horas):
+            if horas is None:
+                return pd.Series(dtype="int64", name="Respostas")
+            por_hora = horas["total"].groupby(level="hora").sum()
+            return por_hora.resample(frequencia).sum().rename("Respostas")
+        return self._memorizado(("respostas", frequencia), calcular)
+
+    def participacao(self, frequencia="D", coluna="conhece_prep", janela=1):
+        # Fração de quem conhece, por período e região; com janela > 1 usa
+        # a soma móvel dos últimos `janela` períodos (razão das somas)
+        def calcular(horas):
+            if horas is None:
+                return pd.DataFrame()
+            por_periodo = (
+                horas[[coluna, "total"]]
+                .unstack("Regiao", fill_value=0)
+                .resample(frequencia).sum()
+            )
+            conhecem, total = por_periodo[coluna], por_periodo["total"]
+            if janela > 1:
+                conhecem = conhecem.rolling(janela, min_periods=1).sum()
+                total = total.rolling(janela, min_periods=1).sum()
+            return conhecem / total.where(total > 0)
+        return self._memorizado(("participacao", frequencia, coluna, janela), calcular)
@@ -0,0 +1,25 @@
+from sklearn.cluster import KMeans, MiniBatchKMeans
+
+from agrupamento import PipelineAgrupamento
+from benchmarks.gerador import gerar_respostas
+from esquema import categorizar
+
+
+def test_reajuste_ao_passar_do_limite_minibatch():
+    # Modelo ajustado com KMeans abaixo do limite: o reajuste acima dele deve
+    # ser completo (KMeans não tem partial_fit) e passar a MiniBatchKMeans
+    dados = categorizar(gerar_respostas(500))
+    pipeline = PipelineAgrupamento(limite_minibatch=300, n_jobs=1)
+    pipeline.resultado(dados.iloc[:250], esperar=True)
+    assert type(pipeline.modelo.kmeans) is KMeans
+
+    clusters, componentes, modelo = pipeline.resultado(dados.iloc[:400], esperar=True)
+    assert isinstance(modelo.kmeans, MiniBatchKMeans)
+    assert modelo.versao == 400
+    assert len(clusters) == len(componentes) == 400
+
+    # Daqui em diante os reajustes são parciais, sobre o MiniBatchKMeans
+    clusters, _, modelo = pipeline.resultado(dados, esperar=True)
+    assert isinstance(modelo.kmeans, MiniBatchKMeans)
+    assert modelo.versao == 500
+    assert len(clusters) == 500
@@ -0,0 +1,125 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from agregacoes import Agregacoes
+from analise_em_blocos import AnaliseEmBlocos
+from armazenamento import ArmazenamentoCSV, ArmazenamentoSQLite
+from benchmarks.gerador import gerar_respostas
+from esquema import COLUNAS, COLUNAS_CATEGORICAS, categorizar
+
+
+def _registros(n, semente):
+    return gerar_respostas(n, semente=semente).to_dict("records")
+
+
+def _abrir(tipo, diretorio):
+    if tipo == "csv":
+        return ArmazenamentoCSV(str(diretorio / "respostas.csv"))
+    return ArmazenamentoSQLite(str(diretorio / "respostas.db"))
+
+
+def _esperado(tipo, respostas):
+    esperado = pd.DataFrame(respostas)[COLUNAS]
+    # No CSV, como em pd.read_csv, um campo vazio volta como ausente
+    return esperado.replace("", np.nan) if tipo == "csv" else esperado
+
+
+def _ler_tudo(armazenamento, desde, tamanho_bloco):
+    blocos, posicoes = [], []
+    for bloco, posicao in armazenamento.ler_em_blocos_desde(desde, tamanho_bloco):
+        blocos.append(bloco)
+        posicoes.append(posicao)
+    return blocos, posicoes
+
+
+@pytest.mark.parametrize("tipo", ["csv", "sqlite"])
+@pytest.mark.parametrize("n, tamanho_bloco, tamanhos", [(25, 10, [10, 10, 5]), (20, 10, [10, 10]), (3, 50, [3])])
+def test_blocos_desde_o_inicio(tmp_path, tipo, n, tamanho_bloco, tamanhos):
+    armazenamento = _abrir(tipo, tmp_path)
+    respostas = _registros(n, semente=1)
+    armazenamento.adicionar_lote(respostas)
+
+    blocos, posicoes = _ler_tudo(armazenamento, 0, tamanho_bloco)
+    assert [len(bloco) for bloco in blocos] == tamanhos
+    assert posicoes == sorted(posicoes) and posicoes[-1] == armazenamento.marcador()
+    lido = pd.concat(blocos, ignore_index=True)[COLUNAS]
+    pd.testing.assert_frame_equal(lido, _esperado(tipo, respostas), check_dtype=False)
+
+
+@pytest.mark.parametrize("tipo", ["csv", "sqlite"])
+def test_retoma_da_posicao(tmp_path, tipo):
+    armazenamento = _abrir(tipo, tmp_path)
+    primeiras, seguintes = _registros(12, semente=1), _registros(7, semente=2)
+    armazenamento.adicionar_lote(primeiras)
+    _, posicoes = _ler_tudo(armazenamento, 0, 5)
+
+    # Nada novo: nenhum bloco e a posição não muda
+    assert _ler_tudo(armazenamento, posicoes[-1], 5) == ([], [])
+
+    armazenamento.adicionar_lote(seguintes)
+    blocos, novas_posicoes = _ler_tudo(armazenamento, posicoes[-1], 5)
+    assert [len(bloco) for bloco in blocos] == [5, 2]
+    assert novas_posicoes[-1] == armazenamento.marcador()
+    lido = pd.concat(blocos, ignore_index=True)[COLUNAS]
+    pd.testing.assert_frame_equal(lido, _esperado(tipo, seguintes), check_dtype=False)
+
+
+def test_csv_ignora_linha_final_incompleta(tmp_path):
+    armazenamento = _abrir("csv", tmp_path)
+    armazenamento.adicionar_lote(_registros(4, semente=1))
+    completo = os.path.getsize(armazenamento.caminho)
+
+    # Outro processo ainda escrevendo a próxima linha
+    resposta = _registros(1, semente=2)[0]
+    escrita = ArmazenamentoCSV(str(tmp_path / "auxiliar.csv"))
+    escrita.adicionar(resposta)
+    with open(escrita.caminho, "rb") as f:
+        linha = f.read().split(b"\n", 1)[1]
+    with open(armazenamento.caminho, "ab") as f:
+        f.write(linha[:15])
+
+    blocos, posicoes = _ler_tudo(armazenamento, 0, 3)
+    assert [len(bloco) for bloco in blocos] == [3, 1]
+    assert posicoes[-1] == completo
+    assert _ler_tudo(armazenamento, completo, 3) == ([], [])
+
+    # Linha completada: é lida a partir da posição guardada
+    with open(armazenamento.caminho, "ab") as f:
+        f.write(linha[15:])
+    blocos, posicoes = _ler_tudo(armazenamento, completo, 3)
+    assert [len(bloco) for bloco in blocos] == [1]
+    assert posicoes[-1] == os.path.getsize(armazenamento.caminho)
+    assert blocos[0].iloc[0]["timestamp"] == resposta["timestamp"]
+
+
+def test_csv_cabecalho_incompleto(tmp_path):
+    armazenamento = _abrir("csv", tmp_path)
+    with open(armazenamento.caminho, "w", encoding="utf-8") as f:
+        f.write(",".join(COLUNAS[:3]))
+    assert _ler_tudo(armazenamento, 0, 10) == ([], [])
+    assert _ler_tudo(_abrir("csv", tmp_path / "inexistente"), 0, 10) == ([], [])
+
+
+@pytest.mark.parametrize("tipo", ["csv", "sqlite"])
+def test_analise_em_blocos_incremental(tmp_path, tipo):
+    armazenamento = _abrir(tipo, tmp_path)
+    analise = AnaliseEmBlocos(armazenamento, tamanho_bloco=4)
+    todas = []
+    for semente, n in enumerate([9, 0, 1, 6]):
+        respostas = _registros(n, semente=semente) if n else []
+        if respostas:
+            armazenamento.adicionar_lote(respostas)
+        todas += respostas
+        assert analise.atualizar() == len(todas)
+        assert analise.posicao == armazenamento.marcador()
+
+    esperado = Agregacoes()
+    esperado.adicionar(categorizar(pd.DataFrame(todas)))
+    for col in COLUNAS_CATEGORICAS:
+        np.testing.assert_array_equal(analise.agregacoes.contagem(col), esperado.contagem(col))
+    np.testing.assert_array_equal(
+        analise.agregacoes.tabela("Regiao", "Renda"), esperado.tabela("Regiao", "Renda")
+    )
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from scipy.stats import chi2_contingency, false_discovery_control
+
+import associacoes
+from associacoes import benjamini_hochberg, holm
+
+
+@pytest.mark.parametrize("semente", range(5))
+def test_benjamini_hochberg_igual_ao_scipy(semente):
+    p = np.random.default_rng(semente).uniform(0, 0.2, size=40)
+    np.testing.assert_allclose(benjamini_hochberg(p), false_discovery_control(p, method="bh"))
+
+
+def test_benjamini_hochberg_ignora_ausentes():
+    p = np.array([0.01, np.nan, 0.04, 0.03, np.nan, 0.005])
+    ajustados = benjamini_hochberg(p)
+    definidos = ~np.isnan(p)
+    assert np.isnan(ajustados[~definidos]).all()
+    np.testing.assert_allclose(ajustados[definidos], false_discovery_control(p[definidos], method="bh"))
+
+
+def test_holm_calculado_a_mao():
+    # Ordenados: 0.005*4 = 0.02, 0.01*3 = 0.03, 0.03*2 = 0.06, 0.04*1 = 0.04 -> 0.06 (monótono)
+    p = np.array([0.01, 0.04, 0.03, 0.005])
+    np.testing.assert_allclose(holm(p), [0.03, 0.06, 0.06, 0.02])
+    # Limitado a 1 e sem contar os ausentes em m
+    np.testing.assert_allclose(holm(np.array([0.2, np.nan, 0.6, 0.01])), [0.4, np.nan, 0.6, 0.03])
+    assert np.isnan(holm(np.array([np.nan, np.nan]))).all()
+
+
+def test_holm_empates_e_limite():
+    # Empates recebem o mesmo valor; produtos acima de 1 ficam em 1
+    np.testing.assert_allclose(holm(np.array([0.02, 0.02, 0.5])), [0.06, 0.06, 0.5])
+    np.testing.assert_allclose(holm(np.array([0.7, 0.6])), [1.0, 1.0])
+
+
+def test_testar_pares_igual_ao_chi2_contingency():
+    rng = np.random.default_rng(0)
+    tabelas = {
+        ("a", "b"): rng.integers(0, 30, size=(4, 3)),
+        ("a", "c"): rng.integers(1, 30, size=(2, 6)),
+        # Linha e coluna sem respostas não contam nos graus de liberdade
+        ("b", "c"): np.array([[5, 0, 7], [0, 0, 0], [3, 0, 9]]),
+        # Uma única opção usada: sem teste
+        ("c", "d"): np.array([[4, 0], [6, 0]]),
+    }
+    resultado = associacoes.testar_pares(tabelas).set_index(["pergunta_a", "pergunta_b"])
+    for par, tabela in tabelas.items():
+        linha = resultado.loc[par]
+        usada = tabela[tabela.sum(axis=1) > 0][:, tabela.sum(axis=0) > 0]
+        if min(usada.shape) < 2:
+            assert np.isnan(linha["p"]) and np.isnan(linha["v_cramer"])
+            continue
+        esperado = chi2_contingency(usada, correction=False)
+        assert linha["gl"] == esperado.dof
+        np.testing.assert_allclose(linha["qui2"], esperado.statistic)
+        np.testing.assert_allclose(linha["p"], esperado.pvalue)
+        v = np.sqrt(esperado.statistic / (usada.sum() * (min(usada.shape) - 1)))
+        np.testing.assert_allclose(linha["v_cramer"], v)
+    validos = resultado["p"].notna()
+    np.testing.assert_allclose(
+        resultado.loc[validos, "p_bh"], false_discovery_control(resultado.loc[validos, "p"], method="bh")
+    )
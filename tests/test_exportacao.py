@@ -0,0 +1,32 @@
+import os
+import stat
+
+import pandas as pd
+
+import exportacao
+from armazenamento import ArmazenamentoSQLite
+from benchmarks.gerador import gerar_respostas
+
+
+def _armazenamento(caminho, n, semente):
+    armazenamento = ArmazenamentoSQLite(str(caminho))
+    armazenamento.adicionar_lote(gerar_respostas(n, semente=semente).to_dict("records"))
+    return armazenamento
+
+
+def test_exportacao_privada_e_separada_por_armazenamento(tmp_path, monkeypatch):
+    monkeypatch.delenv("PESQUISA_EXPORTACOES", raising=False)
+    a = _armazenamento(tmp_path / "a.db", 30, semente=1)
+    b = _armazenamento(tmp_path / "b.db", 30, semente=2)
+
+    caminho_a = exportacao.exportar(a, "CSV", 30)
+    caminho_b = exportacao.exportar(b, "CSV", 30)
+
+    # Padrão ao lado do armazenamento, acessível só pelo dono
+    assert os.path.dirname(caminho_a) == str(tmp_path / "exportacoes")
+    assert stat.S_IMODE(os.stat(tmp_path / "exportacoes").st_mode) & 0o077 == 0
+    assert stat.S_IMODE(os.stat(caminho_a).st_mode) == 0o600
+    # Mesma versão, armazenamentos diferentes: arquivos diferentes
+    assert caminho_a != caminho_b
+    assert not pd.read_csv(caminho_a).equals(pd.read_csv(caminho_b))
+    assert os.path.exists(caminho_a)
@@ -0,0 +1,26 @@
+import numpy as np
+
+from graficos import CacheGraficos, amostra_dispersao
+
+
+def test_cache_limitado_por_bytes():
+    cache = CacheGraficos(capacidade=10, max_bytes=100)
+    cache.obter("a", lambda: b"a" * 60)
+    cache.obter("b", lambda: b"b" * 30)
+    assert cache.bytes == 90
+    # O terceiro passa do limite: sai o menos usado recentemente
+    cache.obter("a", lambda: b"nunca gerado")
+    cache.obter("c", lambda: b"c" * 30)
+    assert list(cache._itens) == ["a", "c"]
+    assert cache.bytes == 90
+    # Maior que o limite inteiro: devolvido, mas fora do cache
+    assert cache.obter("d", lambda: b"d" * 200) == b"d" * 200
+    assert "d" not in cache._itens
+
+
+def test_amostra_dispersao_fixa_e_limitada():
+    assert amostra_dispersao(50, amostra=100) == slice(None)
+    linhas = amostra_dispersao(10000, amostra=100)
+    assert len(linhas) == len(np.unique(linhas)) == 100
+    assert np.all(np.diff(linhas) > 0)
+    assert np.array_equal(linhas, amostra_dispersao(10000, amostra=100))
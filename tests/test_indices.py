@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.gerador import gerar_respostas
+from esquema import OPCOES, categorizar
+from indices import IndiceBitmap
+
+
+@pytest.fixture(scope="module")
+def dados():
+    dados = categorizar(gerar_respostas(203, semente=3))
+    # Algumas respostas sem valor, que não entram em nenhum bitmap
+    dados.loc[[0, 9, 100], "Regiao"] = np.nan
+    return dados
+
+
+def _indice_em_blocos(dados, tamanhos):
+    # Blocos de tamanhos que não são múltiplos de 8: cada um começa no meio
+    # de um byte do anterior, e a capacidade inicial força o crescimento
+    indice = IndiceBitmap(capacidade=8)
+    inicio = 0
+    for tamanho in tamanhos:
+        indice.adicionar(dados.iloc[inicio:inicio + tamanho])
+        inicio += tamanho
+    assert inicio == len(dados) == indice.total
+    return indice
+
+
+FILTROS = [
+    {"Regiao": [OPCOES["Regiao"][0]]},
+    {"Regiao": OPCOES["Regiao"][:3], "Faixa_etaria": OPCOES["Faixa_etaria"][1:4]},
+    {"Genero": [OPCOES["Genero"][0]], "Renda": OPCOES["Renda"][:2], "Conhecimento_PrEP": OPCOES["Conhecimento_PrEP"][:1]},
+]
+
+
+@pytest.mark.parametrize("tamanhos", [[203], [1, 7, 3, 5, 187], [13] * 15 + [8]])
+@pytest.mark.parametrize("filtros", FILTROS)
+def test_mascara_igual_ao_filtro_do_pandas(dados, tamanhos, filtros):
+    indice = _indice_em_blocos(dados, tamanhos)
+    esperado = np.ones(len(dados), dtype=bool)
+    for col, opcoes in filtros.items():
+        esperado &= dados[col].isin(opcoes).to_numpy()
+    np.testing.assert_array_equal(indice.mascara(filtros), esperado)
+    # Máscara limitada a uma versão anterior dos dados
+    np.testing.assert_array_equal(indice.mascara(filtros, total=101), esperado[:101])
+
+
+def test_mascara_sem_filtros(dados):
+    indice = _indice_em_blocos(dados, [5, 198])
+    assert indice.mascara({}).all() and len(indice.mascara({})) == len(dados)
+
+
+@pytest.mark.parametrize("filtros", FILTROS)
+def test_selecao_igual_a_value_counts_e_crosstab(dados, filtros):
+    indice = _indice_em_blocos(dados, [1, 7, 3, 5, 187])
+    selecao = indice.selecao(filtros, dados)
+    filtrados = dados[indice.mascara(filtros)]
+    assert len(selecao) == len(filtrados)
+
+    for col in ("Regiao", "Genero", "Faixa_etaria"):
+        esperado = filtrados[col].value_counts(sort=False).reindex(OPCOES[col])
+        np.testing.assert_array_equal(selecao.contagem(col).to_numpy(), esperado.to_numpy())
+    metodos = filtrados["Metodos_prevencao"].dropna().value_counts()
+    pd.testing.assert_series_equal(
+        selecao.contagem("Metodos_prevencao").sort_index(), metodos.rename("Metodos_prevencao").sort_index()
+    )
+
+    tabela = selecao.tabela("Regiao", "Renda")
+    esperada = pd.crosstab(filtrados["Regiao"], filtrados["Renda"], dropna=False).reindex(
+        index=OPCOES["Regiao"], columns=OPCOES["Renda"], fill_value=0
+    )
+    np.testing.assert_array_equal(tabela.to_numpy(), esperada.to_numpy())
+    np.testing.assert_array_equal(selecao.tabela("Renda", "Regiao").to_numpy(), esperada.to_numpy().T)
@@ -0,0 +1,66 @@
+from protecao import DUPLICADA, EXCESSO, GuardaEnvios, impressao_digital
+
+RESPOSTA = {"Regiao": "Centro", "Genero": "Mulher cis", "timestamp": "2025-01-01 10:00:00"}
+
+
+def _resposta(i):
+    return dict(RESPOSTA, Renda=str(i))
+
+
+def test_impressao_digital_ignora_timestamp():
+    outra_hora = dict(RESPOSTA, timestamp="2025-01-01 10:00:01")
+    assert impressao_digital("s", RESPOSTA) == impressao_digital("s", outra_hora)
+    assert impressao_digital("s", RESPOSTA) != impressao_digital("t", RESPOSTA)
+    assert impressao_digital("s", RESPOSTA) != impressao_digital("s", dict(RESPOSTA, Regiao="Zona Sul"))
+
+
+def test_duplicata_ate_a_validade():
+    guarda = GuardaEnvios(validade=10, limite=100)
+    assert guarda.verificar("s", RESPOSTA, agora=0) is None
+    assert guarda.verificar("s", RESPOSTA, agora=9.9) == DUPLICADA
+    # Outra sessão com o mesmo conteúdo não é duplicata
+    assert guarda.verificar("t", RESPOSTA, agora=9.9) is None
+    assert guarda.verificar("s", RESPOSTA, agora=10) is None
+    assert guarda.aceitas == 3
+    assert guarda.rejeitadas == {DUPLICADA: 1, EXCESSO: 0}
+
+
+def test_balde_de_fichas():
+    # 3 envios, repostos à taxa de 3 por 30 s (uma ficha a cada 10 s)
+    guarda = GuardaEnvios(limite=3, janela=30)
+    assert [guarda.verificar("s", _resposta(i), agora=0) for i in range(4)] == [None, None, None, EXCESSO]
+    assert guarda.verificar("s", _resposta(4), agora=9.9) == EXCESSO
+    assert guarda.verificar("s", _resposta(5), agora=10) is None
+    assert guarda.verificar("s", _resposta(6), agora=10) == EXCESSO
+    # O limite é por sessão
+    assert guarda.verificar("t", _resposta(7), agora=10) is None
+    # Depois de uma janela inteira o balde volta cheio, sem passar do limite
+    assert [guarda.verificar("s", _resposta(10 + i), agora=100) for i in range(4)] == [None, None, None, EXCESSO]
+    assert guarda.rejeitadas[EXCESSO] == 4
+
+
+def test_expiracao_e_capacidade():
+    guarda = GuardaEnvios(validade=10, limite=100, janela=60, capacidade=2)
+    for i in range(3):
+        guarda.verificar(f"s{i}", RESPOSTA, agora=i)
+    # Acima da capacidade saem as impressões e os baldes mais antigos
+    assert len(guarda._digitais) == 2 and len(guarda._baldes) == 2
+    assert guarda.verificar("s0", RESPOSTA, agora=3) is None
+    # Vencidas (impressões após `validade`, baldes após `janela`) saem na próxima verificação
+    guarda.verificar("x", _resposta(1), agora=70)
+    assert len(guarda._digitais) == 1 and list(guarda._baldes) == ["x"]
+
+
+def test_desfazer_libera_nova_tentativa():
+    guarda = GuardaEnvios(limite=1, janela=60)
+    assert guarda.verificar("s", RESPOSTA, agora=0) is None
+    # Fila cheia: o envio não foi gravado e é desfeito
+    guarda.desfazer("s", RESPOSTA)
+    assert guarda.aceitas == 0
+    # A nova tentativa não é duplicata e recupera a ficha gasta
+    assert guarda.verificar("s", RESPOSTA, agora=1) is None
+    assert guarda.verificar("s", _resposta(1), agora=1) == EXCESSO
+    # Desfazer algo que não foi aceito não altera nada
+    guarda.desfazer("s", _resposta(2))
+    assert guarda.aceitas == 1
+    assert guarda.verificar("s", _resposta(3), agora=1) == EXCESSO